@@ -1,10 +1,14 @@
 import streamlit as st
 import plotly.graph_objects as go
-import pandas as pd
 import time
 from datetime import datetime, timedelta
 import numpy as np
-from agent_graph import run_analysis
+from agent_graph import run_analysis, collect_analysis
+from report_cache import get_report_cache
+import price_series
+import peers
+import job_queue
+from config import get_setting
 
 # 1. PAGE CONFIGURATION
 st.set_page_config(
@@ -14,6 +18,30 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Seconds between checks for a background-refreshed report (see report_cache.py)
+REFRESH_POLL_SECONDS = 5
+report_cache = get_report_cache()
+
+# With SWARMTRADER_JOB_QUEUE=1 analyses run in worker processes (python job_queue.py --workers N)
+USE_JOB_QUEUE = str(get_setting("SWARMTRADER_JOB_QUEUE", "")).lower() in ("1", "true", "yes")
+
+
+def analysis_stream(company_name, priority=job_queue.PRIORITY_INTERACTIVE):
+    """Yields {agent_name: output} chunks, either from the in-process graph or a queued job."""
+    if USE_JOB_QUEUE:
+        return job_queue.stream_job(job_queue.enqueue(company_name, priority))
+    return run_analysis(company_name)
+
+
+def collect_state(company_name):
+    if not USE_JOB_QUEUE:
+        return collect_analysis(company_name)
+    final_state = {}
+    for chunk in analysis_stream(company_name, job_queue.PRIORITY_BACKGROUND):
+        for agent_data in chunk.values():
+            final_state.update(agent_data)
+    return final_state
+
 # 2. CUSTOM CSS
 st.markdown("""
 <style>
@@ -185,6 +213,15 @@ with st.sidebar:
     p_details.markdown(render_agent_status("Company Details", initial_status), unsafe_allow_html=True)
     p_analyst.markdown(render_agent_status("Master Analyst", initial_status), unsafe_allow_html=True)
 # 5. EXECUTION LOGIC
+# Shared cache first: popular names are served instantly, stale ones refresh in the background
+cached_entry = report_cache.lookup(company_input) if run_btn and company_input.strip() else None
+if cached_entry:
+    if report_cache.is_stale(cached_entry):
+        report_cache.refresh_async(company_input, cached_entry["ticker"], collect_state)
+    st.session_state['data'] = cached_entry["state"]
+    st.session_state['data_version'] = (cached_entry["ticker"], cached_entry["version"])
+    st.rerun()
+
 if run_btn:
     # Reset UI to running state
     p_resolve.markdown(render_agent_status("Ticker Resolver", "running"), unsafe_allow_html=True)
@@ -197,7 +234,7 @@ if run_btn:
 
     try:
         with st.spinner("Coordinating Multi-Agent Swarm..."):
-            for chunk in run_analysis(company_input):
+            for chunk in analysis_stream(company_input):
 
                 # LOOP through the chunk to update state and status
                 for agent_name, agent_data in chunk.items():
@@ -231,6 +268,8 @@ if run_btn:
         # Save to session state
         if final_state:
             st.session_state['data'] = final_state
+            entry = report_cache.put(company_input, final_state)
+            st.session_state['data_version'] = (entry["ticker"], entry["version"]) if entry else None
             st.rerun()  # This reloads the page, and Section 4 above will now render everything as "Green/Done"
 
     except Exception as e:
@@ -242,6 +281,27 @@ if run_btn:
 st.title(" AI Multi-Agent Market Analyst")
 st.caption("Global Financial Intelligence | Powered by LangGraph & Gemini")
 
+
+# Pushes a background-refreshed report into this session when it lands in the shared cache
+@st.fragment(run_every=REFRESH_POLL_SECONDS)
+def watch_cached_report():
+    version = st.session_state.get('data_version')
+    if not version:
+        return
+    ticker, seen_version = version
+    entry = report_cache.get(ticker)
+    if entry and entry["version"] > seen_version:
+        st.session_state['data'] = entry["state"]
+        st.session_state['data_version'] = (ticker, entry["version"])
+        st.rerun()
+    if report_cache.is_refreshing(ticker):
+        st.caption("🔄 Refreshing this report in the background...")
+    elif entry:
+        st.caption(f"Report generated {datetime.fromtimestamp(entry['created_at']).strftime('%H:%M')}")
+
+
+watch_cached_report()
+
 if 'data' in st.session_state and st.session_state['data']:
     data = st.session_state['data']
 
@@ -375,13 +435,17 @@ if 'data' in st.session_state and st.session_state['data']:
     col_chart, col_report = st.columns([2, 1])
 
     with col_chart:
-        st.markdown("##### Stock Price History (1 Year)")
+        st.markdown("##### Stock Price History")
 
         # Get Real Price Data
-        history = data.get('market_data', {}).get('history_data', [])
+        market_data = data.get('market_data', {})
+        history = market_data.get('history_data', [])
 
         if history:
-            df_hist = pd.DataFrame(history)
+            # Server-side range selection: right resolution + LTTB, so the payload stays ~constant
+            chart_range = st.radio("Range", list(price_series.RANGES), index=3, horizontal=True,
+                                   label_visibility="collapsed", key="chart_range")
+            df_hist = price_series.series_for_range(market_data, chart_range)
 
             fig = go.Figure()
             fig.add_trace(go.Scatter(
@@ -395,18 +459,7 @@ if 'data' in st.session_state and st.session_state['data']:
             ))
 
             fig.update_layout(
-                xaxis=dict(
-                    rangeselector=dict(
-                        buttons=list([
-                            dict(count=1, label="1m", step="month", stepmode="backward"),
-                            dict(count=3, label="3m", step="month", stepmode="backward"),
-                            dict(count=6, label="6m", step="month", stepmode="backward"),
-                            dict(count=1, label="1y", step="year", stepmode="backward"),
-                            dict(step="all")
-                        ])
-                    ),
-                    type="date"
-                ),
+                xaxis=dict(type="date"),
                 yaxis=dict(title="Price ($)", showgrid=True, gridcolor='#f0f0f0'),
                 margin=dict(l=0, r=0, t=0, b=0),
                 height=350,
@@ -417,6 +470,39 @@ if 'data' in st.session_state and st.session_state['data']:
         else:
             st.warning("No historical price data available.")
 
+        st.markdown("##### Revenue & Net Income")
+        chart_data = data.get('financial_data', {}).get('chart_data', {})
+        frequencies = [f for f in ("annual", "quarterly") if chart_data.get(f)]
+
+        if frequencies:
+            frequency = st.radio("Statements", frequencies, horizontal=True,
+                                 label_visibility="collapsed", key="statement_frequency")
+            statement = chart_data[frequency]
+
+            fig_fin = go.Figure()
+            fig_fin.add_trace(go.Bar(x=statement['periods'], y=statement['revenue'],
+                                     name='Revenue', marker_color='#0066cc'))
+            fig_fin.add_trace(go.Bar(x=statement['periods'], y=statement['net_income'],
+                                     name='Net Income', marker_color='#28a745'))
+            fig_fin.add_trace(go.Scatter(x=statement['periods'], y=statement['net_margin'],
+                                         name='Net Margin (%)', yaxis='y2', mode='lines+markers',
+                                         line=dict(color='#fd7e14', width=2)))
+
+            fig_fin.update_layout(
+                barmode='group',
+                xaxis=dict(type="category"),
+                yaxis=dict(title=statement.get('currency', ''), showgrid=True, gridcolor='#f0f0f0'),
+                yaxis2=dict(title="Margin (%)", overlaying='y', side='right', showgrid=False),
+                legend=dict(orientation="h", y=1.1),
+                margin=dict(l=0, r=0, t=0, b=0),
+                height=300,
+                paper_bgcolor='white',
+                plot_bgcolor='white'
+            )
+            st.plotly_chart(fig_fin, use_container_width=True)
+        else:
+            st.info("No financial statement history available for this ticker.")
+
     with col_report:
         st.markdown("#####  Analyst Report")
         with st.container(border=True):
@@ -441,6 +527,47 @@ if 'data' in st.session_state and st.session_state['data']:
             for item in swot.get('threats', [])[:3]:
                 st.markdown(f"• {item}")
 
+    # --- SECTION 4: SECTOR PEER COMPARISON ---
+    st.markdown("##### Section 4 — Sector Peer Comparison")
+    ticker = data.get('ticker', '')
+    sector = company_detail.get("sector") or data.get('company_details', {}).get("sector")
+    peer_cache = st.session_state.setdefault('peers', {})
+
+    if ticker and "UNKNOWN" not in ticker:
+        if ticker not in peer_cache:
+            if st.button(f"Compare {ticker} with sector peers", key="peer_btn"):
+                with st.spinner("Fetching peer set and running comparative analysis..."):
+                    peer_cache[ticker] = peers.compare_peers(ticker, sector, data.get('company_name'))
+
+        comparison = peer_cache.get(ticker)
+        if comparison and "error" in comparison:
+            st.warning(f"Peer comparison unavailable: {comparison['error']}")
+        elif comparison:
+            analysis = comparison["analysis"]
+            pc1, pc2, pc3, pc4 = st.columns(4)
+            with pc1:
+                create_fundamental_card("", "Relative Valuation", analysis.get("relative_valuation", "N/A"))
+            with pc2:
+                create_fundamental_card("", "Relative Momentum", analysis.get("relative_momentum", "N/A"))
+            with pc3:
+                create_fundamental_card("", "Relative Risk", analysis.get("relative_risk", "N/A"))
+            with pc4:
+                create_fundamental_card("", "Best Peer Alternative", analysis.get("best_peer_alternative", "N/A"))
+
+            st.write("")
+            table = comparison["table"]
+            display = table[["name", "currency", "market_cap_usd", "pe", "pe_percentile", "return_6m", "return_1y",
+                             "relative_strength", "volatility", "volatility_rank"]].copy()
+            for col in ["return_6m", "return_1y", "relative_strength", "volatility"]:
+                display[col] = (display[col] * 100).round(1)
+            display["market_cap_usd"] = (display["market_cap_usd"] / 1e9).round(1)
+            display.columns = ["Name", "Currency", "Mkt Cap ($B)", "P/E", "P/E Pctl", "6M %", "1Y %",
+                               "Rel. Strength %", "Volatility %", "Vol Rank"]
+            st.dataframe(display, width="stretch")
+            st.write(analysis.get("summary", ""))
+            for item in analysis.get("highlights", [])[:3]:
+                st.markdown(f"• {item}")
+
 else:
     # Landing Page State
     st.info(" Enter a company name in the sidebar and click 'Generate Analysis' to begin.")
\ No newline at end of file
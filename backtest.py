@@ -0,0 +1,226 @@
+"""
+Backtest of historical SwarmTrader recommendations.
+
+Every final_report is stored with its ticker and timestamp (see run_analysis).
+evaluate() scores all stored reports against cached closing prices in one
+NumPy pass: forward returns for every report x horizon, directional hit rates,
+and confidence calibration - no per-row Python loops.
+
+CLI:  python backtest.py [--no-refresh] [--horizons 1,5,20,60]
+Page: pages/backtest.py
+"""
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import market_data
+from storage import open_db
+
+BACKTEST_DB = "backtest.db"
+HORIZONS = (1, 5, 20, 60)  # trading days
+CONFIDENCE_BINS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker           TEXT NOT NULL,
+    created_at       REAL NOT NULL,
+    recommendation   TEXT,
+    sentiment_score  REAL,
+    confidence_score REAL,
+    report_json      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_ticker ON reports (ticker, created_at);
+CREATE TABLE IF NOT EXISTS prices (
+    ticker TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    close  REAL,
+    PRIMARY KEY (ticker, date)
+);
+"""
+
+
+def _init(conn):
+    conn.executescript(SCHEMA)
+
+
+def _score(value, default=np.nan):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# --- REPORT STORE ---
+
+def record_report(ticker: str, report: dict, created_at: float = None):
+    if not ticker or "UNKNOWN" in ticker or not report or report.get("analysis_failed"):
+        return
+    with open_db(BACKTEST_DB) as conn:
+        _init(conn)
+        conn.execute(
+            "INSERT INTO reports (ticker, created_at, recommendation, sentiment_score, confidence_score, report_json) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (ticker, created_at or time.time(), str(report.get("recommendation", "HOLD")).upper(),
+             _score(report.get("sentiment_score")), _score(report.get("confidence_score")),
+             json.dumps(report, default=str)))
+
+
+def load_reports():
+    with open_db(BACKTEST_DB) as conn:
+        _init(conn)
+        return pd.read_sql_query(
+            "SELECT id, ticker, created_at, recommendation, sentiment_score, confidence_score FROM reports", conn)
+
+
+# --- PRICE CACHE ---
+
+def refresh_prices(tickers: list, period: str = "2y"):
+    """Fetches closes for tickers whose cache is behind, in one batched yahooquery call."""
+    if not tickers:
+        return
+    with open_db(BACKTEST_DB) as conn:
+        _init(conn)
+        latest = dict(conn.execute("SELECT ticker, MAX(date) FROM prices GROUP BY ticker").fetchall())
+    today = pd.Timestamp.now().normalize()
+    last_session = (today - pd.offsets.BDay(1)).strftime("%Y-%m-%d")
+    stale = [t for t in tickers if latest.get(t, "") < last_session]
+    if not stale:
+        return
+
+    print(f"--- [Backtest] Refreshing prices for {len(stale)} tickers ---")
+    with market_data.client(stale, asynchronous=True) as yahoo:
+        df = yahoo.history(period=period, interval="1d")
+    if isinstance(df, dict) or df.empty:
+        print("   [Backtest] No price data returned")
+        return
+    df = df.reset_index()[["symbol", "date", "close"]].dropna()
+    df["date"] = pd.to_datetime(df["date"], utc=True).dt.strftime("%Y-%m-%d")
+    with open_db(BACKTEST_DB) as conn:
+        conn.executemany("INSERT OR REPLACE INTO prices (ticker, date, close) VALUES (?, ?, ?)",
+                         df.itertuples(index=False, name=None))
+
+
+def load_price_matrix(tickers: list):
+    """(dates[datetime64[D]], tickers, closes[T x K]) with gaps forward-filled per ticker."""
+    with open_db(BACKTEST_DB) as conn:
+        _init(conn)
+        placeholders = ",".join("?" * len(tickers))
+        prices = pd.read_sql_query(
+            f"SELECT ticker, date, close FROM prices WHERE ticker IN ({placeholders})", conn, params=tickers)
+    if prices.empty:
+        return np.array([], dtype="datetime64[D]"), [], np.empty((0, 0))
+    matrix = prices.pivot(index="date", columns="ticker", values="close").sort_index().ffill()
+    dates = pd.to_datetime(matrix.index).values.astype("datetime64[D]")
+    return dates, list(matrix.columns), matrix.to_numpy(dtype=np.float64)
+
+
+# --- VECTORIZED EVALUATION ---
+
+def evaluate(reports: pd.DataFrame, dates: np.ndarray, tickers: list, closes: np.ndarray,
+             horizons=HORIZONS):
+    """
+    Returns (forward_returns, hits, direction), each shaped [reports x horizons] (direction: [reports]).
+    Entry is the close on the report day (or the next session); exit is `h` sessions later.
+    Missing prices / horizons beyond the data are NaN.
+    """
+    horizons = np.asarray(horizons, dtype=np.int64)
+    n = len(reports)
+    if n == 0 or closes.size == 0:
+        empty = np.full((n, len(horizons)), np.nan)
+        return empty, empty.copy(), np.zeros(n)
+
+    col = pd.Index(tickers).get_indexer(reports["ticker"])
+    report_days = pd.to_datetime(reports["created_at"], unit="s").values.astype("datetime64[D]")
+    entry = np.searchsorted(dates, report_days, side="left")
+    exit_ = entry[:, None] + horizons[None, :]
+
+    valid = (col >= 0)[:, None] & (entry < len(dates))[:, None] & (exit_ < len(dates))
+    col_c = np.clip(col, 0, closes.shape[1] - 1)
+    entry_px = closes[np.clip(entry, 0, len(dates) - 1), col_c]
+    exit_px = closes[np.clip(exit_, 0, len(dates) - 1), col_c[:, None]]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        forward = exit_px / entry_px[:, None] - 1.0
+    forward = np.where(valid, forward, np.nan)
+
+    rec = reports["recommendation"].fillna("").str.upper()
+    direction = np.select([rec.str.contains("BUY").to_numpy(), rec.str.contains("SELL").to_numpy()],
+                          [1.0, -1.0], 0.0)
+    hits = np.where(np.isnan(forward) | (direction[:, None] == 0), np.nan,
+                    (np.sign(forward) == direction[:, None]).astype(np.float64))
+    return forward, hits, direction
+
+
+def _column_mean(values: np.ndarray):
+    """NaN-skipping column mean from counts; NaN for empty columns without np.nanmean's warning."""
+    counts = np.sum(~np.isnan(values), axis=0)
+    sums = np.nansum(values, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def summarize(reports: pd.DataFrame, forward: np.ndarray, hits: np.ndarray, direction: np.ndarray,
+              horizons=HORIZONS):
+    """Per-horizon performance table and a confidence calibration table."""
+    directional = np.where(direction[:, None] != 0, forward * direction[:, None], np.nan)
+    performance = pd.DataFrame({
+        "horizon_days": list(horizons),
+        "evaluated": np.sum(~np.isnan(forward), axis=0),
+        "signals": np.sum(~np.isnan(hits), axis=0),
+        "mean_return_%": np.round(_column_mean(forward) * 100, 2),
+        "mean_directional_return_%": np.round(_column_mean(directional) * 100, 2),
+        "hit_rate_%": np.round(_column_mean(hits) * 100, 1),
+    })
+
+    # Calibration: does a 70%-confidence call come true ~70% of the time?
+    confidence = reports["confidence_score"].to_numpy(dtype=np.float64)
+    bins = np.clip(np.nan_to_num(confidence, nan=0) // (100 / CONFIDENCE_BINS), 0, CONFIDENCE_BINS - 1).astype(int)
+    rows = []
+    for h_idx, h in enumerate(horizons):
+        mask = ~np.isnan(hits[:, h_idx])
+        counts = np.bincount(bins[mask], minlength=CONFIDENCE_BINS)
+        hit_sums = np.bincount(bins[mask], weights=hits[mask, h_idx], minlength=CONFIDENCE_BINS)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(counts > 0, hit_sums / counts * 100, np.nan)
+        lower = np.arange(CONFIDENCE_BINS) * (100 // CONFIDENCE_BINS)
+        rows.append(pd.DataFrame({
+            "horizon_days": h,
+            "confidence_bin": [f"{lo}-{lo + 100 // CONFIDENCE_BINS}" for lo in lower],
+            "expected_hit_%": lower + 50 // CONFIDENCE_BINS,
+            "observed_hit_%": np.round(rate, 1),
+            "signals": counts,
+        }))
+    calibration = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+    return performance, calibration
+
+
+def run_backtest(horizons=HORIZONS, refresh: bool = True):
+    reports = load_reports()
+    if reports.empty:
+        return reports, pd.DataFrame(), pd.DataFrame()
+    tickers = sorted(reports["ticker"].unique())
+    if refresh:
+        try:
+            refresh_prices(tickers)
+        except Exception as e:
+            print(f"   [Backtest] Price refresh failed, using cached prices: {e}")
+    dates, price_tickers, closes = load_price_matrix(tickers)
+    forward, hits, direction = evaluate(reports, dates, price_tickers, closes, horizons)
+    performance, calibration = summarize(reports, forward, hits, direction, horizons)
+    return reports, performance, calibration
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest stored SwarmTrader recommendations.")
+    parser.add_argument("--horizons", default=",".join(map(str, HORIZONS)))
+    parser.add_argument("--no-refresh", action="store_true", help="Use cached prices only")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stored, perf, calib = run_backtest(tuple(int(h) for h in args.horizons.split(",")), not args.no_refresh)
+    print(f"{len(stored)} reports evaluated in {time.perf_counter() - start:.2f}s\n")
+    print(perf.to_string(index=False))
+    print()
+    print(calib.to_string(index=False))
@@ -0,0 +1,108 @@
+"""
+Offline model benchmark over recorded prompts.
+
+Record a corpus first by running the app with SWARMTRADER_RECORD_PROMPTS=1, then:
+    python benchmark_models.py --models gemini-2.5-flash-lite,gemini-2.5-flash
+Reports latency and JSON validity per model per node, and suggests the fastest
+model that still parses reliably for each node.
+"""
+import json
+import time
+import argparse
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from model_router import PROMPT_LOG, DEFAULT_NODE_MODELS, get_node_config, build_client
+from structured_output import SCHEMAS, parse_json
+
+
+def load_recorded_prompts(path: str, nodes=None, limit: int = 20):
+    prompts = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            node = entry.get("node")
+            if nodes and node not in nodes:
+                continue
+            if len(prompts[node]) < limit:
+                prompt = entry["prompt"]
+                if isinstance(prompt, list):
+                    prompt = [(m["role"], m["content"]) for m in prompt]
+                prompts[node].append(prompt)
+    return prompts
+
+
+def is_valid_json(text: str, node: str):
+    try:
+        parse_json(text, node)
+        return True
+    except ValueError:
+        return False
+
+
+def benchmark(prompts: dict, models: list, repeat: int = 1):
+    rows = []
+    for node, node_prompts in prompts.items():
+        node_config = get_node_config(node)
+        for model in models:
+            client = build_client(model, node_config["timeout"], 0)
+            if node in SCHEMAS:
+                # Same native structured output the graph nodes use
+                client = client.bind(response_mime_type="application/json", response_schema=SCHEMAS[node])
+            latencies, valid, errors = [], 0, 0
+            for prompt in node_prompts:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    try:
+                        response = client.invoke(prompt)
+                        valid += is_valid_json(response.content, node)
+                    except Exception as e:
+                        print(f"   [{node}/{model}] call failed: {e}")
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+            runs = len(latencies)
+            rows.append({
+                "node": node,
+                "model": model,
+                "runs": runs,
+                "p50_s": round(float(np.percentile(latencies, 50)), 2) if runs else None,
+                "p95_s": round(float(np.percentile(latencies, 95)), 2) if runs else None,
+                "json_valid": round(valid / runs, 3) if runs else 0.0,
+                "errors": errors,
+            })
+    return pd.DataFrame(rows)
+
+
+def suggest_routing(results: pd.DataFrame, min_valid: float = 0.95):
+    suggestions = {}
+    for node, group in results.groupby("node"):
+        reliable = group[group["json_valid"] >= min_valid]
+        if reliable.empty:
+            continue
+        suggestions[node] = reliable.sort_values("p50_s").iloc[0]["model"]
+    return suggestions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark candidate models per graph node on recorded prompts.")
+    parser.add_argument("--models", default="gemini-2.5-flash-lite,gemini-2.5-flash")
+    parser.add_argument("--nodes", default="", help=f"Comma separated subset of {', '.join(DEFAULT_NODE_MODELS)}")
+    parser.add_argument("--prompts", default=PROMPT_LOG)
+    parser.add_argument("--limit", type=int, default=20, help="Max recorded prompts per node")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--min-valid", type=float, default=0.95)
+    args = parser.parse_args()
+
+    nodes = [n for n in args.nodes.split(",") if n]
+    prompts = load_recorded_prompts(args.prompts, nodes, args.limit)
+    if not prompts:
+        raise SystemExit(f"No recorded prompts found in {args.prompts}")
+
+    results = benchmark(prompts, [m for m in args.models.split(",") if m], args.repeat)
+    print(results.to_string(index=False))
+    print("\nSuggested routing (fastest model with JSON validity >= {:.0%}):".format(args.min_valid))
+    for node, model in suggest_routing(results, args.min_valid).items():
+        print(f"  {node}: {model}")
@@ -0,0 +1,17 @@
+import os
+import streamlit as st
+
+
+def get_setting(name: str, default=None):
+    """Read a setting from Streamlit secrets, falling back to environment variables."""
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        # No secrets.toml (CLI tools, workers) - fall through to the environment
+        pass
+    return os.environ.get(name, default)
+
+
+# Local cache / database directory shared by all SwarmTrader stores
+DATA_DIR = get_setting("SWARMTRADER_DATA_DIR", ".swarmtrader")
@@ -0,0 +1,246 @@
+"""
+Durable SQLite job queue for analysis requests.
+
+The Streamlit page enqueues a job and subscribes to its progress events;
+a pool of worker processes claims jobs (highest priority first), runs the
+compiled graph and publishes every node's output as an event. Active jobs are
+deduplicated by company name, failed attempts are retried with backoff, and
+jobs whose worker died are reclaimed once their lease expires.
+
+Run workers with:  python job_queue.py --workers 4
+"""
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from storage import open_db
+
+QUEUE_DB = "jobs.db"
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BACKGROUND = 0
+LEASE_SECONDS = 300
+# Running jobs refresh their lease this often, so a long node never looks like a dead worker
+HEARTBEAT_SECONDS = 30
+RETRY_BACKOFF_SECONDS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    company_name TEXT NOT NULL,
+    dedup_key    TEXT NOT NULL,
+    priority     INTEGER NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL DEFAULT 'queued',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker       TEXT,
+    error        TEXT,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    run_after    REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs (dedup_key) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority DESC, id);
+CREATE TABLE IF NOT EXISTS events (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id     INTEGER NOT NULL,
+    node       TEXT NOT NULL,
+    payload    TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_job ON events (job_id, id);
+"""
+
+
+def init_db():
+    with open_db(QUEUE_DB) as conn:
+        conn.executescript(SCHEMA)
+
+
+def dedup_key(company_name: str):
+    return " ".join(company_name.lower().split())
+
+
+# --- PRODUCER SIDE ---
+
+def enqueue(company_name: str, priority: int = PRIORITY_INTERACTIVE, max_attempts: int = 3):
+    """Returns the job id; an already queued/running job for the same company is reused."""
+    init_db()
+    key = dedup_key(company_name)
+    now = time.time()
+    with open_db(QUEUE_DB) as conn:
+        # Write lock up front: concurrent enqueues of the same company must not both reach the INSERT
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT id, priority FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')",
+                           (key,)).fetchone()
+        if row:
+            if priority > row["priority"]:
+                conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, row["id"]))
+            return row["id"]
+        cursor = conn.execute(
+            "INSERT INTO jobs (company_name, dedup_key, priority, max_attempts, created_at, updated_at, run_after) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (company_name, key, priority, max_attempts, now, now, now))
+        return cursor.lastrowid
+
+
+def get_job(job_id: int):
+    with open_db(QUEUE_DB) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def events_since(job_id: int, after_id: int = 0):
+    with open_db(QUEUE_DB) as conn:
+        rows = conn.execute("SELECT id, node, payload FROM events WHERE job_id = ? AND id > ? ORDER BY id",
+                            (job_id, after_id)).fetchall()
+    return [(row["id"], row["node"], json.loads(row["payload"]) if row["payload"] else {}) for row in rows]
+
+
+def stream_job(job_id: int, poll_seconds: float = 0.5, timeout: float = 600):
+    """Yields {node: output} chunks as the worker publishes them - same shape as app.stream()."""
+    last_id = 0
+    deadline = time.time() + timeout
+    while True:
+        for event_id, node, payload in events_since(job_id, last_id):
+            last_id = event_id
+            yield {node: payload}
+        job = get_job(job_id)
+        if job is None:
+            raise RuntimeError(f"Job {job_id} disappeared")
+        if job["status"] == "done":
+            for event_id, node, payload in events_since(job_id, last_id):
+                yield {node: payload}
+            return
+        if job["status"] == "failed":
+            raise RuntimeError(f"Analysis job failed: {job['error']}")
+        if time.time() > deadline:
+            raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout:.0f}s")
+        time.sleep(poll_seconds)
+
+
+# --- WORKER SIDE ---
+
+def claim(worker_id: str):
+    now = time.time()
+    with open_db(QUEUE_DB) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Reclaim jobs whose worker stopped heartbeating; a job that used up its attempts fails instead
+        conn.execute("UPDATE jobs SET status = 'failed', error = 'Worker lost on final attempt', updated_at = ? "
+                     "WHERE status = 'running' AND updated_at < ? AND attempts >= max_attempts",
+                     (now, now - LEASE_SECONDS))
+        conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND updated_at < ? "
+                     "AND attempts < max_attempts", (now - LEASE_SECONDS,))
+        row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? "
+                           "ORDER BY priority DESC, id LIMIT 1", (now,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, updated_at = ? "
+                     "WHERE id = ?", (worker_id, now, row["id"]))
+        return dict(row)
+
+
+def publish(job_id: int, node: str, payload: dict):
+    now = time.time()
+    with open_db(QUEUE_DB) as conn:
+        conn.execute("INSERT INTO events (job_id, node, payload, created_at) VALUES (?, ?, ?, ?)",
+                     (job_id, node, json.dumps(payload, default=str), now))
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+
+
+def heartbeat(job_id: int, worker_id: str):
+    with open_db(QUEUE_DB) as conn:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                     (time.time(), job_id, worker_id))
+
+
+def _keep_lease(job_id: int, worker_id: str, stop: threading.Event):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            heartbeat(job_id, worker_id)
+        except sqlite3.Error as e:
+            print(f"   [Worker {worker_id}] heartbeat failed: {e}")
+
+
+def complete(job_id: int):
+    with open_db(QUEUE_DB) as conn:
+        conn.execute("UPDATE jobs SET status = 'done', error = NULL, updated_at = ? WHERE id = ?",
+                     (time.time(), job_id))
+
+
+def fail(job_id: int, error: str):
+    now = time.time()
+    with open_db(QUEUE_DB) as conn:
+        job = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job and job["attempts"] < job["max_attempts"]:
+            conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, error = ?, updated_at = ?, run_after = ? "
+                         "WHERE id = ?", (error, now, now + RETRY_BACKOFF_SECONDS * job["attempts"], job_id))
+        else:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                         (error, now, job_id))
+
+
+def purge(older_than_seconds: float = 24 * 3600):
+    cutoff = time.time() - older_than_seconds
+    with open_db(QUEUE_DB) as conn:
+        conn.execute("DELETE FROM events WHERE job_id IN "
+                     "(SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?)", (cutoff,))
+        conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,))
+
+
+def worker_loop(worker_id: str, poll_seconds: float = 1.0):
+    # Imported here so every worker process builds its own clients
+    from agent_graph import run_analysis
+
+    init_db()
+    print(f"--- [Worker {worker_id}] ready ---")
+    last_purge = 0
+    while True:
+        job = claim(worker_id)
+        if job is None:
+            if time.time() - last_purge > 3600:
+                purge()
+                last_purge = time.time()
+            time.sleep(poll_seconds)
+            continue
+
+        print(f"--- [Worker {worker_id}] job {job['id']}: {job['company_name']} ---")
+        stop = threading.Event()
+        threading.Thread(target=_keep_lease, args=(job["id"], worker_id, stop), daemon=True).start()
+        try:
+            for chunk in run_analysis(job["company_name"]):
+                for node, output in chunk.items():
+                    publish(job["id"], node, output)
+            complete(job["id"])
+        except Exception as e:
+            print(f"   [Worker {worker_id}] job {job['id']} failed: {e}")
+            fail(job["id"], str(e))
+        finally:
+            stop.set()
+
+
+def start_workers(count: int):
+    processes = []
+    for i in range(count):
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-{i}"
+        process = multiprocessing.Process(target=worker_loop, args=(worker_id,), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run SwarmTrader analysis workers.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    init_db()
+    workers = start_workers(args.workers)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("--- Stopping workers ---")
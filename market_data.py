@@ -0,0 +1,187 @@
+"""
+Pooled yahooquery clients and one combined market-data fetch per ticker.
+
+Every `Ticker(...)` used to open its own HTTP session and repeat the cookie/crumb
+handshake before the first real request. Here a small pool of clients is built
+once per process and reused: borrowing a client only swaps its `symbols`, so the
+keep-alive connections and crumb are shared across nodes, sessions and threads.
+
+`get_bundle(ticker)` pulls quote modules, price history and news for a ticker
+back-to-back on one client and keeps the result for a short TTL, so the
+financials, market data and news nodes of one run share a single fetch.
+"""
+import time
+import queue
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import streamlit as st
+from yahooquery import Ticker
+from config import get_setting
+
+POOL_SIZE = int(get_setting("YAHOO_POOL_SIZE", 4))
+# Rebuild clients periodically so an expired crumb/cookie cannot stick around
+CLIENT_MAX_AGE_SECONDS = 6 * 3600
+BUNDLE_TTL_SECONDS = 60
+QUOTE_MODULES = ["price", "summaryDetail", "defaultKeyStatistics", "financialData"]
+NEWS_COUNT = 15
+
+
+class ClientPool:
+    """Thread-safe pool of reusable Ticker clients (sync or asynchronous)."""
+
+    def __init__(self, size: int, asynchronous: bool = False):
+        self.asynchronous = asynchronous
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _build(self, symbols):
+        print(f"   ... [Yahoo] New {'async ' if self.asynchronous else ''}client (session + crumb) ...")
+        client = Ticker(symbols, asynchronous=self.asynchronous)
+        client._built_at = time.time()
+        if client.crumb is None:
+            print("   [Yahoo] No crumb for the new client; it will not be pooled")
+        return client
+
+    def _reusable(self, client):
+        return client.crumb is not None and time.time() - client._built_at <= CLIENT_MAX_AGE_SECONDS
+
+    @contextmanager
+    def client(self, symbols):
+        self._slots.acquire()
+        client = None
+        try:
+            try:
+                client = self._idle.get_nowait()
+                if not self._reusable(client):
+                    client = self._build(symbols)
+                else:
+                    client.symbols = symbols
+            except queue.Empty:
+                client = self._build(symbols)
+            yield client
+        except Exception:
+            # A failing client may hold a stale crumb; let the next borrower build a fresh one
+            client = None
+            raise
+        finally:
+            # Crumb-less (get_crumb failed) or retired clients are dropped, not pooled
+            if client is not None and self._reusable(client):
+                self._idle.put(client)
+            self._slots.release()
+
+
+@st.cache_resource
+def get_pool(asynchronous: bool = False):
+    return ClientPool(POOL_SIZE, asynchronous)
+
+
+def client(symbols, asynchronous: bool = False):
+    """`with market_data.client(["AAPL", "MSFT"], asynchronous=True) as t: t.price`"""
+    return get_pool(asynchronous).client(symbols)
+
+
+# --- NORMALIZERS ---
+
+def history_frame(df):
+    """Date/Open/High/Low/Close/Volume frame from a yahooquery history result, or None."""
+    if isinstance(df, dict) or df is None or df.empty:
+        return None
+    df = df.reset_index()
+    if 'date' in df.columns:
+        df = df.rename(columns={'date': 'Date'})
+    df['Date'] = pd.to_datetime(df['Date'], utc=True).dt.tz_localize(None)
+
+    ohlcv = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+    columns = ['Date'] + [c for c in ohlcv if c in df.columns]
+    return df[columns].rename(columns=ohlcv)
+
+
+def news_list(raw_news, ticker: str):
+    if isinstance(raw_news, dict):
+        items = raw_news.get(ticker, [])
+        if not items:
+            # If the dict has values, take the first value found (robustness for single ticker queries)
+            values = list(raw_news.values())
+            if values and isinstance(values[0], list):
+                items = values[0]
+        raw_news = items
+    return raw_news if isinstance(raw_news, list) else []
+
+
+# --- COMBINED FETCH ---
+
+_bundles = {}
+_bundle_locks = {}
+_bundles_lock = threading.Lock()
+
+
+def _fetch_bundle(ticker: str, history_period: str, history_start: str, interval: str):
+    bundle = {"fetched_at": time.time(), "history_start": history_start,
+              "quote": {}, "history": None, "news": [], "errors": {}}
+    with client(ticker) as yahoo:
+        steps = {
+            "quote": lambda: yahoo.get_modules(QUOTE_MODULES).get(ticker),
+            "history": lambda: history_frame(
+                yahoo.history(start=history_start, interval=interval) if history_start
+                else yahoo.history(period=history_period, interval=interval)),
+            "news": lambda: news_list(yahoo.news(count=NEWS_COUNT), ticker),
+        }
+        for part, fetch in steps.items():
+            try:
+                value = fetch()
+                if part == "quote" and not isinstance(value, dict):
+                    raise ValueError(value or "No quote data")
+                bundle[part] = value
+            except Exception as e:
+                print(f"   [Yahoo] {part} for {ticker} failed: {e}")
+                bundle["errors"][part] = str(e)
+        if len(bundle["errors"]) == len(steps):
+            # Nothing worked - most likely an expired crumb, so retire this client
+            yahoo._built_at = 0
+    return bundle
+
+
+def get_bundle(ticker: str, history_period: str = "1y", history_start: str = None, interval: str = "1d",
+               force: bool = False):
+    """
+    {"quote": {module: dict}, "history": DataFrame | None, "news": [...], "errors": {...}}.
+    `history_start` asks for a delta (sessions since that date) instead of the full period;
+    the bundle records which one it holds. Concurrent callers for the same ticker wait for
+    one fetch instead of starting their own. `force` skips the BUNDLE_TTL_SECONDS reuse.
+    """
+    with _bundles_lock:
+        lock = _bundle_locks.setdefault(ticker, threading.Lock())
+    with lock:
+        bundle = _bundles.get(ticker)
+        if bundle and not force and time.time() - bundle["fetched_at"] < BUNDLE_TTL_SECONDS:
+            return bundle
+        bundle = _fetch_bundle(ticker, history_period, history_start, interval)
+        if len(bundle["errors"]) < len(("quote", "history", "news")):
+            _bundles[ticker] = bundle
+        return bundle
+
+
+def quote_facts(quote: dict):
+    """Flat {label: raw value} of the quote fields the fundamentals prompt cares about."""
+    price = quote.get("price", {}) or {}
+    detail = quote.get("summaryDetail", {}) or {}
+    stats = quote.get("defaultKeyStatistics", {}) or {}
+    financial = quote.get("financialData", {}) or {}
+    facts = {
+        "Currency": price.get("currency"),
+        "Exchange": price.get("exchangeName"),
+        "Share Price": price.get("regularMarketPrice"),
+        "Market Cap": price.get("marketCap") or detail.get("marketCap"),
+        "Revenue TTM": financial.get("totalRevenue"),
+        "Net Income": stats.get("netIncomeToCommon"),
+        "Beta": detail.get("beta"),
+        "PE Ratio": detail.get("trailingPE"),
+        "EPS TTM": stats.get("trailingEps"),
+        "Dividend Yield": detail.get("dividendYield"),
+        "52W High": detail.get("fiftyTwoWeekHigh"),
+        "52W Low": detail.get("fiftyTwoWeekLow"),
+        "Volume": detail.get("volume") or price.get("regularMarketVolume"),
+        "Shares Outstanding": stats.get("sharesOutstanding"),
+    }
+    return {label: value for label, value in facts.items() if value not in (None, "", {})}
@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import streamlit as st
+from langchain_google_genai import ChatGoogleGenerativeAI
+from config import get_setting, DATA_DIR
+
+# --- PER-NODE MODEL ROUTING ---
+# Simple extraction nodes get the light model, synthesis keeps the stronger one.
+# Override per node with a [MODEL_ROUTING.<node>] table in secrets.toml, or a JSON
+# object in the SWARMTRADER_MODEL_ROUTING environment variable, e.g.
+#   {"master_analyst": {"model": "gemini-2.5-pro", "timeout": 120}}
+DEFAULT_NODE_MODELS = {
+    "ticker_resolver":       {"model": "gemini-2.5-flash-lite", "timeout": 15, "max_retries": 2},
+    "company_details_agent": {"model": "gemini-2.5-flash-lite", "timeout": 20, "max_retries": 2},
+    "news_agent":            {"model": "gemini-2.5-flash-lite", "timeout": 30, "max_retries": 2},
+    "financials_agent":      {"model": "gemini-2.5-flash",      "timeout": 60, "max_retries": 2},
+    "master_analyst":        {"model": "gemini-2.5-flash",      "timeout": 90, "max_retries": 2},
+    "peer_analyst":          {"model": "gemini-2.5-flash",      "timeout": 90, "max_retries": 2},
+}
+
+PROMPT_LOG = os.path.join(DATA_DIR, "recorded_prompts.jsonl")
+
+
+def _routing_overrides():
+    overrides = get_setting("MODEL_ROUTING") or get_setting("SWARMTRADER_MODEL_ROUTING")
+    if not overrides:
+        return {}
+    if isinstance(overrides, str):
+        try:
+            return json.loads(overrides)
+        except ValueError:
+            print(f"   [Warning] Ignoring invalid SWARMTRADER_MODEL_ROUTING: {overrides}")
+            return {}
+    return {node: dict(cfg) for node, cfg in dict(overrides).items()}
+
+
+def get_node_config(node: str):
+    config = dict(DEFAULT_NODE_MODELS.get(node, DEFAULT_NODE_MODELS["master_analyst"]))
+    config.update(_routing_overrides().get(node, {}))
+    return config
+
+
+@st.cache_resource
+def build_client(model: str, timeout: float, max_retries: int = 2):
+    """One client (and so one connection pool) per model/timeout combination."""
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=0,
+        timeout=timeout,
+        max_retries=max_retries,
+        google_api_key=get_setting("GOOGLE_API_KEY")
+    )
+
+
+def get_llm(node: str):
+    config = get_node_config(node)
+    return build_client(config["model"], config["timeout"], config.get("max_retries", 2))
+
+
+def _serialize_prompt(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    return [{"role": message.type, "content": message.content} for message in prompt]
+
+
+def record_prompt(node: str, prompt, model: str):
+    """Appends the prompt to the offline benchmark corpus when SWARMTRADER_RECORD_PROMPTS is set."""
+    if str(get_setting("SWARMTRADER_RECORD_PROMPTS", "")).lower() not in ("1", "true", "yes"):
+        return
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with open(PROMPT_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"node": node, "model": model, "ts": time.time(),
+                                "prompt": _serialize_prompt(prompt)}) + "\n")
+    except OSError as e:
+        print(f"   [Warning] Could not record prompt: {e}")
@@ -0,0 +1,139 @@
+import re
+import time
+import hashlib
+from storage import open_db
+
+NEWS_DB = "news.db"
+
+# Articles scoring below this never reach the LLM
+MIN_RELEVANCE_SCORE = 2
+
+# Cheap local impact scorer - keyword -> weight (3 = market-moving, 1 = weak signal).
+# Generic words ("stock", "market", "shares") appear in almost every headline and are left out.
+IMPACT_KEYWORDS = {
+    3: ["earnings", "guidance", "downgrade", "upgrade", "acquisition", "acquire", "merger",
+        "lawsuit", "investigation", "probe", "sec", "antitrust", "bankruptcy", "fraud",
+        "resign", "steps down", "appoints", "ceo", "cfo", "recall", "buyback", "dividend",
+        "profit warning", "revenue miss", "beats estimates", "misses estimates", "delisting"],
+    2: ["price target", "analyst", "rating", "forecast", "outlook", "partnership", "contract",
+        "layoffs", "job cuts", "regulator", "fine", "settlement", "stake", "ipo", "spin-off",
+        "quarterly", "results", "tariff", "sanction"],
+    1: ["launch", "expands", "deal", "deliveries", "sales"],
+}
+# Whole words only ("rating" must not match "operating"), allowing plural/past-tense endings
+IMPACT_PATTERNS = {
+    weight: re.compile(r"\b(" + "|".join(re.escape(kw) for kw in keywords) + r")(?:s|es|d|ed)?\b")
+    for weight, keywords in IMPACT_KEYWORDS.items()
+}
+
+SCHEMA = """
+-- The same story is often tagged with several tickers, so "seen" is tracked per ticker
+CREATE TABLE IF NOT EXISTS articles (
+    ticker       TEXT NOT NULL,
+    article_id   TEXT NOT NULL,
+    title        TEXT,
+    summary      TEXT,
+    url          TEXT,
+    published_at INTEGER,
+    score        INTEGER,
+    fetched_at   INTEGER,
+    PRIMARY KEY (ticker, article_id)
+);
+CREATE INDEX IF NOT EXISTS idx_articles_ticker ON articles (ticker, published_at);
+CREATE TABLE IF NOT EXISTS ticker_summaries (
+    ticker        TEXT PRIMARY KEY,
+    news_summary  TEXT,
+    impact_level  TEXT,
+    article_count INTEGER,
+    updated_at    INTEGER
+);
+"""
+
+
+def _init(conn):
+    conn.executescript(SCHEMA)
+
+
+def article_id(item: dict):
+    """Stable id for a news item: provider uuid, else URL, else a hash of the title."""
+    for key in ("uuid", "id", "link", "url"):
+        if item.get(key):
+            return str(item[key])
+    return hashlib.sha1(item.get("title", "").strip().lower().encode("utf-8")).hexdigest()
+
+
+def score_article(item: dict):
+    text = f"{item.get('title', '')} {item.get('summary', '')}".lower()
+    return sum(weight * len(set(pattern.findall(text))) for weight, pattern in IMPACT_PATTERNS.items())
+
+
+def _normalize(ticker: str, item: dict):
+    published = item.get("providerPublishTime") or item.get("provider_publish_time") or 0
+    if not isinstance(published, (int, float)):
+        published = 0
+    return {
+        "article_id": article_id(item),
+        "ticker": ticker,
+        "title": item.get("title", ""),
+        "summary": re.sub(r"\s+", " ", item.get("summary", "") or "")[:500],
+        "url": item.get("link") or item.get("url", ""),
+        "published_at": int(published),
+        "score": score_article(item),
+    }
+
+
+def filter_unseen(ticker: str, news_list: list):
+    """Returns normalized articles for this ticker that are not in the store yet, newest first."""
+    items = {}
+    for raw in news_list:
+        if isinstance(raw, dict) and raw.get("title"):
+            item = _normalize(ticker, raw)
+            items[item["article_id"]] = item
+    if not items:
+        return []
+
+    with open_db(NEWS_DB) as conn:
+        _init(conn)
+        ids = list(items)
+        placeholders = ",".join("?" * len(ids))
+        seen = {row["article_id"] for row in conn.execute(
+            f"SELECT article_id FROM articles WHERE ticker = ? AND article_id IN ({placeholders})",
+            [ticker] + ids)}
+
+    unseen = [item for aid, item in items.items() if aid not in seen]
+    return sorted(unseen, key=lambda i: i["published_at"], reverse=True)
+
+
+def save_articles(items: list):
+    if not items:
+        return
+    now = int(time.time())
+    with open_db(NEWS_DB) as conn:
+        _init(conn)
+        conn.executemany(
+            "INSERT OR IGNORE INTO articles "
+            "(article_id, ticker, title, summary, url, published_at, score, fetched_at) "
+            "VALUES (:article_id, :ticker, :title, :summary, :url, :published_at, :score, :fetched_at)",
+            [{**item, "fetched_at": now} for item in items])
+
+
+def get_ticker_summary(ticker: str):
+    with open_db(NEWS_DB) as conn:
+        _init(conn)
+        row = conn.execute("SELECT * FROM ticker_summaries WHERE ticker = ?", (ticker,)).fetchone()
+    if row is None:
+        return None
+    return dict(row)
+
+
+def save_ticker_summary(ticker: str, news_summary: str, impact_level: str, new_articles: int):
+    with open_db(NEWS_DB) as conn:
+        _init(conn)
+        conn.execute(
+            "INSERT INTO ticker_summaries (ticker, news_summary, impact_level, article_count, updated_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(ticker) DO UPDATE SET news_summary = excluded.news_summary, "
+            "impact_level = excluded.impact_level, "
+            "article_count = ticker_summaries.article_count + excluded.article_count, "
+            "updated_at = excluded.updated_at",
+            (ticker, news_summary, impact_level, new_articles, int(time.time())))
@@ -0,0 +1,75 @@
+"""
+Per-node result cache shared by the Streamlit app, job workers and the
+pre-warm scheduler. Values are JSON blobs with an expiry time, keyed by
+node namespace and ticker (or company name for ticker resolution).
+"""
+import json
+import time
+from storage import open_db
+
+NODE_CACHE_DB = "node_cache.db"
+
+# Seconds each node's output stays fresh
+TTLS = {
+    "ticker": 30 * 24 * 3600,
+    "company_details": 7 * 24 * 3600,
+    "financials": 12 * 3600,
+    "market_data": 15 * 60,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS node_cache (
+    namespace  TEXT NOT NULL,
+    cache_key  TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, cache_key)
+);
+"""
+
+
+def _key(key: str):
+    return " ".join(str(key).lower().split())
+
+
+def get(namespace: str, key: str, include_stale: bool = False):
+    with open_db(NODE_CACHE_DB) as conn:
+        conn.executescript(SCHEMA)
+        row = conn.execute("SELECT value, expires_at FROM node_cache WHERE namespace = ? AND cache_key = ?",
+                           (namespace, _key(key))).fetchone()
+    if row is None or (not include_stale and row["expires_at"] < time.time()):
+        return None
+    return json.loads(row["value"])
+
+
+def put(namespace: str, key: str, value, ttl: float = None):
+    now = time.time()
+    ttl = TTLS.get(namespace, 3600) if ttl is None else ttl
+    with open_db(NODE_CACHE_DB) as conn:
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT OR REPLACE INTO node_cache VALUES (?, ?, ?, ?, ?)",
+                     (namespace, _key(key), json.dumps(value, default=str), now, now + ttl))
+
+
+def cached(namespace: str, key: str, compute, is_valid=bool):
+    """Returns the fresh cached value, or computes, stores (if is_valid) and returns it."""
+    value = get(namespace, key)
+    if value is not None:
+        print(f"   ... [{namespace}] cache hit for {key} ...")
+        return value
+    value = compute()
+    if is_valid(value):
+        put(namespace, key, value)
+    return value
+
+
+def freshness(namespace: str, keys: list, at: float = None):
+    """{key: True/False} - whether each key has an entry that is fresh now (or still at `at`)."""
+    now = at or time.time()
+    with open_db(NODE_CACHE_DB) as conn:
+        conn.executescript(SCHEMA)
+        rows = conn.execute("SELECT cache_key, expires_at FROM node_cache WHERE namespace = ?",
+                            (namespace,)).fetchall()
+    fresh = {row["cache_key"]: row["expires_at"] >= now for row in rows}
+    return {key: fresh.get(_key(key), False) for key in keys}
@@ -0,0 +1,50 @@
+import time
+import streamlit as st
+import plotly.graph_objects as go
+import backtest
+
+st.set_page_config(page_title="SwarmTrader Backtest", layout="wide", page_icon="📊")
+
+st.title(" Recommendation Backtest")
+st.caption("How past SwarmTrader calls performed against forward returns")
+
+with st.sidebar:
+    st.markdown("### ⚙️ Backtest Settings")
+    horizons = st.multiselect("Horizons (trading days)", [1, 5, 10, 20, 60, 120], default=list(backtest.HORIZONS))
+    refresh = st.checkbox("Refresh cached prices", value=True)
+    run_btn = st.button("Run Backtest ↗", type="primary", width="stretch")
+
+if run_btn and horizons:
+    start = time.perf_counter()
+    with st.spinner("Evaluating stored recommendations..."):
+        results = backtest.run_backtest(tuple(sorted(horizons)), refresh)
+    st.session_state['backtest'] = (*results, time.perf_counter() - start)
+
+if 'backtest' in st.session_state:
+    reports, performance, calibration, elapsed = st.session_state['backtest']
+    if reports.empty:
+        st.info("No stored reports yet. Generate a few analyses first.")
+        st.stop()
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Stored Reports", len(reports))
+    c2.metric("Tickers", reports["ticker"].nunique())
+    c3.metric("Evaluation Time", f"{elapsed:.2f}s")
+
+    st.markdown("##### Forward Returns & Hit Rates")
+    st.dataframe(performance, hide_index=True, width="stretch")
+
+    st.markdown("##### Confidence Calibration")
+    horizon = st.selectbox("Horizon", sorted(performance["horizon_days"].unique()), index=0)
+    calib = calibration[calibration["horizon_days"] == horizon]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=calib["confidence_bin"], y=calib["observed_hit_%"], name="Observed hit %",
+                         marker_color="#0066cc"))
+    fig.add_trace(go.Scatter(x=calib["confidence_bin"], y=calib["expected_hit_%"], name="Perfect calibration",
+                             mode="lines+markers", line=dict(color="#dc3545", dash="dash")))
+    fig.update_layout(yaxis=dict(title="Hit rate (%)", range=[0, 100]), height=350,
+                      margin=dict(l=0, r=0, t=0, b=0), paper_bgcolor="white", plot_bgcolor="white")
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(calib, hide_index=True, width="stretch")
+else:
+    st.info(" Choose horizons in the sidebar and click 'Run Backtest'.")
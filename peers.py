@@ -0,0 +1,213 @@
+"""
+Sector peer comparison.
+
+Resolves a peer set for a ticker (Yahoo "similar symbols" plus the sector
+screener), pulls quotes and a year of prices for the whole set in batched
+yahooquery calls, computes relative metrics across the peer matrix with
+pandas/NumPy, and makes ONE comparative analyst call - instead of a full swarm
+run per peer.
+"""
+import numpy as np
+import pandas as pd
+from yahooquery import Screener
+import market_data
+import prompts
+import structured_output
+
+PEER_LIMIT = 10
+QUOTE_MODULES = ["price", "summaryDetail", "defaultKeyStatistics", "assetProfile"]
+TRADING_DAYS = 252
+# Quote currencies in minor units (pence, cents) -> (major currency, units per major)
+MINOR_UNITS = {"GBp": ("GBP", 100), "GBX": ("GBP", 100), "ZAc": ("ZAR", 100), "ILA": ("ILS", 100)}
+
+# Yahoo sector name -> predefined Morningstar sector screener
+SECTOR_SCREENERS = {
+    "technology": "ms_technology",
+    "healthcare": "ms_healthcare",
+    "financial services": "ms_financial_services",
+    "consumer cyclical": "ms_consumer_cyclical",
+    "consumer defensive": "ms_consumer_defensive",
+    "communication services": "ms_communication_services",
+    "industrials": "ms_industrials",
+    "energy": "ms_energy",
+    "basic materials": "ms_basic_materials",
+    "real estate": "ms_real_estate",
+    "utilities": "ms_utilities",
+}
+
+
+def _similar_symbols(ticker: str):
+    with market_data.client(ticker) as yahoo:
+        data = yahoo.recommendations
+    entry = data.get(ticker, {}) if isinstance(data, dict) else {}
+    if not isinstance(entry, dict):
+        return []
+    return [item["symbol"] for item in entry.get("recommendedSymbols", []) if item.get("symbol")]
+
+
+def _sector_symbols(sector: str, count: int = 25):
+    screener_id = SECTOR_SCREENERS.get((sector or "").strip().lower())
+    if not screener_id:
+        return []
+    data = Screener().get_screeners([screener_id], count=count)
+    quotes = data.get(screener_id, {}).get("quotes", []) if isinstance(data, dict) else []
+    return [q["symbol"] for q in quotes if q.get("symbol")]
+
+
+def fetch_peer_data(symbols: list):
+    """Quote modules and 1y daily closes for all symbols - two batched calls on one client."""
+    # A pooled client's session is not shared between threads; the async client
+    # already fans each call out across the symbols
+    with market_data.client(symbols, asynchronous=True) as client:
+        modules = client.get_modules(QUOTE_MODULES)
+        history = client.history(period="1y", interval="1d")
+    return modules if isinstance(modules, dict) else {}, history
+
+
+def resolve_peers(ticker: str, sector: str = None, limit: int = PEER_LIMIT):
+    """Same-sector peers for ticker: similar symbols first, topped up from the sector screener."""
+    candidates = []
+    for source in (_similar_symbols, lambda t: _sector_symbols(sector)):
+        try:
+            candidates += [s for s in source(ticker) if s != ticker and s not in candidates]
+        except Exception as e:
+            print(f"   [Peers] Candidate lookup failed: {e}")
+    return candidates[: limit * 2]
+
+
+def _quote_frame(modules: dict):
+    rows = {}
+    for symbol, data in modules.items():
+        if not isinstance(data, dict):
+            continue
+        summary = data.get("summaryDetail", {}) or {}
+        stats = data.get("defaultKeyStatistics", {}) or {}
+        price = data.get("price", {}) or {}
+        profile = data.get("assetProfile", {}) or {}
+        rows[symbol] = {
+            "name": price.get("shortName") or symbol,
+            "currency": price.get("currency"),
+            "sector": profile.get("sector"),
+            "industry": profile.get("industry"),
+            "market_cap": price.get("marketCap") or summary.get("marketCap"),
+            "price": price.get("regularMarketPrice"),
+            "shares": stats.get("sharesOutstanding"),
+            "pe": summary.get("trailingPE"),
+            "forward_pe": summary.get("forwardPE") or stats.get("forwardPE"),
+            "price_to_book": stats.get("priceToBook"),
+            "dividend_yield": summary.get("dividendYield"),
+            "beta": summary.get("beta"),
+        }
+    frame = pd.DataFrame.from_dict(rows, orient="index")
+    for col in ["market_cap", "price", "shares", "pe", "forward_pe", "price_to_book", "dividend_yield", "beta"]:
+        if col in frame:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce")
+    return frame
+
+
+def _usd_rates(currencies):
+    """{currency: USD per unit} from one batched Yahoo FX quote call; missing rates are left out."""
+    rates = {"USD": 1.0}
+    pairs = {f"{c}USD=X": c for c in currencies if c and c != "USD"}
+    if not pairs:
+        return rates
+    try:
+        with market_data.client(list(pairs)) as client:
+            data = client.price
+    except Exception as e:
+        print(f"   [Peers] FX rates failed: {e}")
+        return rates
+    for pair, currency in pairs.items():
+        quote = data.get(pair) if isinstance(data, dict) else None
+        if isinstance(quote, dict) and quote.get("regularMarketPrice"):
+            rates[currency] = float(quote["regularMarketPrice"])
+    return rates
+
+
+def _with_usd_market_cap(quotes: pd.DataFrame):
+    """
+    market_cap in the listing's major currency plus market_cap_usd, so peers from
+    .NS/.T/.L and US listings rank on one scale. Shares x price is preferred because
+    it is unambiguous about pence/cents quotes; Yahoo's marketCap is the fallback.
+    """
+    units = quotes["currency"].map(lambda c: MINOR_UNITS.get(c, (c, 1)))
+    major = units.str[0]
+    quotes = quotes.assign(currency=major)
+    quotes["market_cap"] = (quotes["shares"] * quotes["price"] / units.str[1]).fillna(quotes["market_cap"])
+    quotes["market_cap_usd"] = quotes["market_cap"] * major.map(_usd_rates(major.dropna().unique()))
+    return quotes.drop(columns=["price", "shares"])
+
+
+def compute_relative_metrics(quotes: pd.DataFrame, history: pd.DataFrame, target: str):
+    """Relative valuation / momentum / risk across the peer matrix (columns = symbols)."""
+    frame = history.reset_index()
+    # yahooquery mixes date and intraday timestamps for the current session
+    frame["date"] = pd.to_datetime(frame["date"], utc=True).dt.tz_localize(None).dt.normalize()
+    # Gaps are carried forward, but rows before a symbol's first bar stay NaN: a recent
+    # listing gets no return for windows it did not trade through
+    closes = (frame.pivot_table(index="date", columns="symbol", values="close", aggfunc="last")
+              .sort_index().ffill())
+    prices = closes.to_numpy(dtype=np.float64)
+
+    def trailing_return(days):
+        start = prices[max(len(prices) - days - 1, 0)]
+        return prices[-1] / start - 1.0
+
+    metrics = pd.DataFrame({
+        "return_3m": trailing_return(63),
+        "return_6m": trailing_return(126),
+        "return_1y": prices[-1] / prices[0] - 1.0,
+        # pandas std skips the leading NaNs (and is NaN, not a warning, for an empty column)
+        "volatility": np.log(closes).diff().std(ddof=0).to_numpy() * np.sqrt(TRADING_DAYS),
+    }, index=closes.columns)
+
+    table = quotes.join(metrics, how="inner")
+    table["relative_strength"] = table["return_1y"] - table["return_1y"].median()
+    table["pe_percentile"] = table["pe"].where(table["pe"] > 0).rank(pct=True)
+    table["momentum_rank"] = table["return_6m"].rank(ascending=False, method="min")
+    table["volatility_rank"] = table["volatility"].rank(method="min")
+    table["is_target"] = table.index == target
+    return table.sort_values("market_cap_usd", ascending=False)
+
+
+def compare_peers(ticker: str, sector: str = None, company_name: str = None, limit: int = PEER_LIMIT):
+    """Returns {"table": DataFrame, "analysis": dict} or {"error": str}."""
+    print(f"--- [Peers] Building peer set for {ticker} ({sector}) ---")
+    candidates = resolve_peers(ticker, sector, limit)
+    if not candidates:
+        return {"error": "No peers found"}
+
+    try:
+        modules, history = fetch_peer_data([ticker] + candidates)
+    except Exception as e:
+        # Network/crumb failures surface as a page warning, not a traceback
+        print(f"   [Peers] Peer data fetch failed: {e}")
+        return {"error": str(e)}
+    quotes = _quote_frame(modules)
+    if ticker not in quotes.index:
+        return {"error": f"No quote data for {ticker}"}
+    quotes = _with_usd_market_cap(quotes)
+    # Yahoo's own sector label is authoritative for filtering; the LLM-extracted one is a fallback
+    yahoo_sector = quotes.loc[ticker, "sector"]
+    target_sector = yahoo_sector if pd.notna(yahoo_sector) and yahoo_sector else (sector if sector != "N/A" else None)
+    if target_sector:
+        same_sector = quotes["sector"].fillna("").str.lower() == str(target_sector).lower()
+        quotes = quotes[same_sector | (quotes.index == ticker)]
+    quotes = pd.concat([quotes.loc[[ticker]],
+                        quotes.drop(index=ticker).sort_values("market_cap_usd", ascending=False).head(limit)])
+
+    if isinstance(history, dict) or history is None or history.empty:
+        return {"error": "No price history for peers"}
+    table = compute_relative_metrics(quotes, history, ticker)
+
+    messages = prompts.build_messages("peer_analyst", f"""Target: {company_name or ticker} ({ticker})
+Sector: {target_sector}
+
+PEER MATRIX (returns/volatility as fractions, percentiles 0-1, ranks 1 = best momentum / lowest volatility):
+{table.drop(columns=["sector"]).round(3).to_string()}""")
+    try:
+        analysis = structured_output.invoke_json("peer_analyst", messages)
+    except Exception as e:
+        print(f"Peer Analyst Error: {e}")
+        analysis = {"summary": "Peer analysis failed. The comparison table is still available."}
+    return {"table": table, "analysis": analysis}
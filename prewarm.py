@@ -0,0 +1,261 @@
+"""
+Scheduled cache pre-warming for watchlist tickers.
+
+Ahead of each configured time (e.g. market open) the scheduler walks the
+watchlist and fills the node caches - ticker resolution, price history deltas,
+fundamentals, company details and news summaries - pacing LLM, search and
+Yahoo calls with token buckets. Interactive runs for warm names then only pay
+for the Master Analyst step (or get a cached report).
+
+The long-lived stages run PREWARM_LEAD_MINUTES ahead; price history and news
+(15 and 10 minute lifetimes) run in a second pass PREWARM_FAST_LEAD_MINUTES
+ahead, and coverage counts only entries that are still fresh at the target time.
+
+Settings (secrets.toml or environment):
+    SWARMTRADER_WATCHLIST      comma separated names/tickers, or a file path (one per line)
+    PREWARM_TIMES              local HH:MM list, default "09:30"
+    PREWARM_LEAD_MINUTES       how long before each time to start, default 45
+    PREWARM_FAST_LEAD_MINUTES  how long before each time to warm price/news, default 5
+    PREWARM_LLM_PER_MINUTE / PREWARM_SEARCH_PER_MINUTE / PREWARM_YAHOO_PER_MINUTE
+    PREWARM_CONCURRENCY        parallel tickers, default 4
+
+Usage:  python prewarm.py            # run forever on the schedule
+        python prewarm.py --once     # warm now and exit
+        python prewarm.py --once --reports   # also store full reports in the report cache
+"""
+import os
+import json
+import time
+import datetime
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import get_setting, DATA_DIR
+import node_cache
+import news_store
+
+STAGES = ["ticker", "market_data", "financials", "company_details", "news"]
+# Stages whose entries expire within minutes; the scheduler warms them last
+FAST_STAGES = ["market_data", "news"]
+SLOW_STAGES = [stage for stage in STAGES if stage not in FAST_STAGES]
+REPORT_PATH = os.path.join(DATA_DIR, "prewarm_report.json")
+
+
+class RateLimiter:
+    """Token bucket: at most `per_minute` acquisitions per rolling minute, shared across threads."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / max(per_minute, 0.001)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+LIMITERS = {
+    "llm": RateLimiter(float(get_setting("PREWARM_LLM_PER_MINUTE", 30))),
+    "search": RateLimiter(float(get_setting("PREWARM_SEARCH_PER_MINUTE", 20))),
+    "yahoo": RateLimiter(float(get_setting("PREWARM_YAHOO_PER_MINUTE", 60))),
+}
+
+# Which limiters a stage consumes when it actually has to do work
+STAGE_COST = {
+    "ticker": ["llm"],
+    "market_data": ["yahoo"],
+    "financials": ["search", "llm"],
+    "company_details": ["search", "llm"],
+    "news": ["yahoo", "llm"],
+}
+
+
+def load_watchlist():
+    raw = get_setting("SWARMTRADER_WATCHLIST", "watchlist.txt")
+    if os.path.exists(str(raw)):
+        with open(raw, encoding="utf-8") as f:
+            names = [line.strip() for line in f]
+    else:
+        names = str(raw).split(",")
+    return [n for n in names if n and not n.startswith("#")]
+
+
+def _is_warm(stage: str, key: str, at: float = None):
+    """Whether the stage's entry is fresh now, or will still be at `at` (epoch seconds)."""
+    at = at or time.time()
+    if stage == "news":
+        from agent_graph import NEWS_FRESH_SECONDS
+        summary = news_store.get_ticker_summary(key)
+        return bool(summary) and at - summary["updated_at"] < NEWS_FRESH_SECONDS
+    return node_cache.freshness(stage, [key], at)[key]
+
+
+def warm_one(name: str, stages: list = STAGES, previous: dict = None):
+    """
+    Fills the given cacheable nodes for one watchlist entry. `previous` is the outcome of
+    an earlier pass for the same name, whose state (ticker etc.) is carried over.
+    Returns per-stage outcome and timing.
+    """
+    import agent_graph
+
+    outcome = {"name": name, "stages": dict(previous["stages"]) if previous else {},
+               "seconds": previous["seconds"] if previous else 0.0}
+    start = time.perf_counter()
+    state = previous["state"] if previous else {"company_name": name, "messages": []}
+    nodes = {
+        "ticker": agent_graph.ticker_node,
+        "market_data": agent_graph.market_data_agent,
+        "financials": agent_graph.financials_agent,
+        "company_details": agent_graph.Company_details_agent,
+        "news": agent_graph.news_agent,
+    }
+    for stage in stages:
+        key = name if stage == "ticker" else state.get("ticker", "")
+        if stage != "ticker" and (not key or "UNKNOWN" in key):
+            outcome["stages"][stage] = "skipped"
+            continue
+        try:
+            if _is_warm(stage, key):
+                status = "cached"
+            else:
+                for limiter in STAGE_COST[stage]:
+                    LIMITERS[limiter].acquire()
+                status = "warmed"
+            state.update(nodes[stage](state))
+            # A node that swallowed its error leaves the cache cold
+            if status == "warmed" and not _is_warm(stage, key if stage != "ticker" else name):
+                status = "failed"
+        except Exception as e:
+            print(f"   [Prewarm] {name}/{stage} failed: {e}")
+            status = "failed"
+        outcome["stages"][stage] = status
+    outcome["ticker"] = state.get("ticker")
+    outcome["state"] = state
+    outcome["seconds"] = round(outcome["seconds"] + time.perf_counter() - start, 2)
+    return outcome
+
+
+def _warm_at_target(result: dict, target_at: float):
+    """Every stage succeeded and its entry is still fresh at the target time."""
+    if not all(s in ("cached", "warmed") for s in result["stages"].values()):
+        return False
+    for stage in STAGES:
+        key = result["name"] if stage == "ticker" else result.get("ticker", "")
+        if not _is_warm(stage, key, target_at):
+            return False
+    return True
+
+
+def warm_watchlist(names: list, concurrency: int = None, full_reports: bool = False,
+                   target_at: datetime.datetime = None):
+    """
+    Warms every stage now, or - with a target time - the slow stages now and the
+    fast ones PREWARM_FAST_LEAD_MINUTES before the target.
+    """
+    concurrency = concurrency or int(get_setting("PREWARM_CONCURRENCY", 4))
+    started = time.perf_counter()
+    print(f"--- [Prewarm] Warming {len(names)} names with {concurrency} workers ---")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if target_at is None:
+            results = list(pool.map(warm_one, names))
+        else:
+            results = list(pool.map(lambda name: warm_one(name, SLOW_STAGES), names))
+            fast_at = target_at - datetime.timedelta(minutes=int(get_setting("PREWARM_FAST_LEAD_MINUTES", 5)))
+            wait = (fast_at - datetime.datetime.now()).total_seconds()
+            if wait > 0:
+                print(f"--- [Prewarm] Price/news pass at {fast_at:%H:%M} ---")
+                time.sleep(wait)
+            results = list(pool.map(lambda result: warm_one(result["name"], FAST_STAGES, result), results))
+
+    if full_reports:
+        _store_reports(results)
+
+    counts = {stage: {} for stage in STAGES}
+    for result in results:
+        for stage, status in result["stages"].items():
+            counts[stage][status] = counts[stage].get(status, 0) + 1
+    # Coverage is judged at the target time: a price entry warmed too early has expired by then
+    target_at = target_at or datetime.datetime.now()
+    fully_warm = sum(_warm_at_target(r, target_at.timestamp()) for r in results)
+    report = {
+        "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "target_at": target_at.isoformat(timespec="seconds"),
+        "names": len(names),
+        "fully_warm": fully_warm,
+        "coverage": round(fully_warm / len(names), 3) if names else 0.0,
+        "duration_seconds": round(time.perf_counter() - started, 1),
+        "stages": counts,
+        "slowest": sorted(({"name": r["name"], "seconds": r["seconds"]} for r in results),
+                          key=lambda r: r["seconds"], reverse=True)[:5],
+    }
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"--- [Prewarm] {fully_warm}/{len(names)} fully warm ({report['coverage']:.0%}) "
+          f"in {report['duration_seconds']}s ---")
+    for stage, stage_counts in counts.items():
+        print(f"   {stage:16s} {stage_counts}")
+    return report
+
+
+def _store_reports(results: list):
+    """Runs the analyst on the warmed state and stores the report in the shared report cache."""
+    import agent_graph
+    import backtest
+    from report_cache import ReportCache, CACHE_BACKEND
+
+    if CACHE_BACKEND == "memory":
+        print("   [Prewarm] REPORT_CACHE_BACKEND is 'memory'; reports would not reach the app, skipping")
+        return
+    cache = ReportCache(CACHE_BACKEND)
+    for result in results:
+        state = result["state"]
+        if not state.get("ticker") or "UNKNOWN" in state["ticker"]:
+            continue
+        LIMITERS["llm"].acquire()
+        state.update(agent_graph.analyst_node(state))
+        backtest.record_report(state["ticker"], state.get("final_report", {}))
+        cache.put(result["name"], state)
+
+
+def next_run_time(now: datetime.datetime, times: list, lead_minutes: int):
+    """Next weekday datetime that is `lead_minutes` before one of the HH:MM times."""
+    candidates = []
+    for day_offset in range(8):
+        day = (now + datetime.timedelta(days=day_offset)).date()
+        if day.weekday() >= 5:
+            continue
+        for hhmm in times:
+            hour, minute = (int(part) for part in hhmm.split(":"))
+            run_at = datetime.datetime.combine(day, datetime.time(hour, minute)) - datetime.timedelta(
+                minutes=lead_minutes)
+            if run_at > now:
+                candidates.append(run_at)
+    return min(candidates)
+
+
+def run_scheduler(full_reports: bool = False):
+    times = [t.strip() for t in str(get_setting("PREWARM_TIMES", "09:30")).split(",") if t.strip()]
+    lead = int(get_setting("PREWARM_LEAD_MINUTES", 45))
+    while True:
+        run_at = next_run_time(datetime.datetime.now(), times, lead)
+        print(f"--- [Prewarm] Next warm-up at {run_at:%Y-%m-%d %H:%M} ---")
+        time.sleep(max((run_at - datetime.datetime.now()).total_seconds(), 0))
+        warm_watchlist(load_watchlist(), full_reports=full_reports,
+                       target_at=run_at + datetime.timedelta(minutes=lead))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm SwarmTrader caches for the watchlist.")
+    parser.add_argument("--once", action="store_true", help="Warm immediately and exit")
+    parser.add_argument("--reports", action="store_true", help="Also store full reports (needs sqlite/redis cache)")
+    args = parser.parse_args()
+
+    if args.once:
+        warm_watchlist(load_watchlist(), full_reports=args.reports)
+    else:
+        run_scheduler(full_reports=args.reports)
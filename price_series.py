@@ -0,0 +1,110 @@
+"""
+Multi-resolution price series for the Plotly chart.
+
+get_stock_price precomputes daily (for intraday bars), weekly and monthly OHLCV
+resamples once per fetch; the base bars are read from history_data. The chart asks for a range (1m/3m/6m/1y/all), gets the finest resolution that
+covers it without gross oversampling, and Largest-Triangle-Three-Buckets (LTTB)
+trims it to a fixed point budget. Payload size stays flat however long the
+history is.
+"""
+import numpy as np
+import pandas as pd
+
+# Finest -> coarsest; pandas resample rules ("base" = history_data as fetched)
+RESOLUTIONS = {"base": None, "1d": "D", "1wk": "W-FRI", "1mo": "ME"}
+RANGES = {"1m": 31, "3m": 92, "6m": 183, "1y": 366, "all": None}
+TARGET_POINTS = 400
+
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def _to_frame(records):
+    df = pd.DataFrame(records)
+    if df.empty:
+        return df
+    df["Date"] = pd.to_datetime(df["Date"], utc=True).dt.tz_localize(None)
+    return df.sort_values("Date").reset_index(drop=True)
+
+
+def resample_ohlcv(df: pd.DataFrame, rule: str):
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in df.columns}
+    out = df.set_index("Date").resample(rule).agg(agg).dropna(subset=["Close"])
+    return out.reset_index()
+
+
+def _is_intraday(df: pd.DataFrame):
+    return len(df) > 1 and df["Date"].diff().median() < pd.Timedelta(days=1)
+
+
+def build_multires(history_data: list):
+    """
+    {resolution: records} for the resampled entries of RESOLUTIONS. The base bars are
+    not copied, and "1d" is only built when they are intraday.
+    """
+    base = _to_frame(history_data)
+    if base.empty:
+        return {}
+    series = {}
+    for name, rule in RESOLUTIONS.items():
+        if rule is None or (rule == "D" and not _is_intraday(base)):
+            continue
+        series[name] = resample_ohlcv(base, rule).to_dict("records")
+    return series
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the kept points:
+    always the first and last, plus the point in each bucket that forms the largest
+    triangle with the previous kept point and the next bucket's average.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    # Bucket boundaries over the interior points [1, n-1)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        nxt_start, nxt_end = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[nxt_start:nxt_end].mean() if nxt_end > nxt_start else x[-1]
+        avg_y = y[nxt_start:nxt_end].mean() if nxt_end > nxt_start else y[-1]
+
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[prev] - avg_x) * (by - y[prev]) - (x[prev] - bx) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
+
+
+def series_for_range(market_data: dict, range_key: str = "1y", target_points: int = TARGET_POINTS):
+    """DataFrame (Date/Open/High/Low/Close/Volume) for the chart, at most target_points rows."""
+    history_data = market_data.get("history_data", [])
+    if not history_data:
+        return pd.DataFrame()
+    series = market_data.get("series") or build_multires(history_data)
+
+    days = RANGES.get(range_key)
+    chosen = None
+    for name, rule in RESOLUTIONS.items():
+        df = _to_frame(history_data if rule is None else series.get(name, []))
+        if df.empty:
+            continue
+        if days is not None:
+            df = df[df["Date"] >= df["Date"].iloc[-1] - pd.Timedelta(days=days)]
+        chosen = df
+        # Finest resolution that does not need more than ~4x decimation
+        if len(df) <= target_points * 4:
+            break
+
+    if chosen is None or len(chosen) <= target_points:
+        return chosen if chosen is not None else pd.DataFrame()
+    idx = lttb(chosen["Date"].to_numpy().astype("datetime64[ns]").astype(np.int64),
+               chosen["Close"].to_numpy(), target_points)
+    return chosen.iloc[idx].reset_index(drop=True)
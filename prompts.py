@@ -0,0 +1,291 @@
+"""
+Prompt templates for every graph node, split into a STATIC system prefix and a
+small DYNAMIC suffix.
+
+The static prefix is byte-identical on every call, so Gemini's implicit context
+caching can reuse it (2.5 models cache repeated prefixes automatically once they
+pass the model's minimum size). Only the dynamic suffix - ticker, search
+snippets, news, price context - changes between calls.
+
+Run `python prompts.py` to print the static prefix size of each node, and
+`python prompts.py --report` for static vs dynamic tokens per node over the
+prompts recorded with SWARMTRADER_RECORD_PROMPTS (see model_router.py).
+"""
+import re
+import json
+import math
+import argparse
+import threading
+from langchain_core.messages import SystemMessage, HumanMessage
+
+# --- STATIC PREFIXES ---
+
+TICKER_SYSTEM = """Act as a financial data expert. Identify the correct Yahoo Finance stock ticker for the company in the user's Input.
+
+GLOBAL TICKER RULES:
+1. USA (NYSE/NASDAQ): Ticker only (Apple -> AAPL).
+2. India: Append '.NS' for NSE (Reliance -> RELIANCE.NS).
+3. United Kingdom: Append '.L' (Tesco -> TSCO.L).
+4. Canada: Append '.TO' for TSX (Shopify -> SHOP.TO).
+5. Europe: Append '.DE' (Frankfurt), '.PA' (Paris) or '.AS' (Amsterdam).
+6. Asia: Append '.HK' (Hong Kong), '.T' (Tokyo), '.SS' (Shanghai), '.KS' (Korea).
+7. Australia: Append '.AX'.
+
+CRITICAL INSTRUCTIONS:
+- Select the primary listing with the highest trading volume.
+- If the company is private or cannot be found, return {"ticker": null}.
+- OUTPUT: Return STRICT JSON only. No markdown, no conversational text.
+
+EXAMPLES:
+Input: "Samsung Electronics" -> {"ticker": "005930.KS"}
+Input: "LVMH" -> {"ticker": "MC.PA"}
+Input: "Commonwealth Bank" -> {"ticker": "CBA.AX"}
+Input: "Microsoft" -> {"ticker": "MSFT"}"""
+
+FUNDAMENTALS_SYSTEM = """You are a Senior Global Financial Data Analyst.
+Extract current financial fundamentals for the company identified by the Ticker in the request, using ONLY the Source Text supplied with it.
+When a "Yahoo Finance Quote" block is present, prefer its raw numbers (in the quote currency) and use the search results to fill gaps.
+
+### 1. REFERENCE - REGIONAL NUMBER SYSTEMS
+- India/South Asia: 1 Lakh = 100,000 (10^5); 1 Crore = 10,000,000 (10^7); 1 Arab = 10^9; 1 Lakh Crore = 10^12.
+- East Asia: 1 Wan/Man = 10,000; 1 Yi/Oku = 100,000,000 (10^8); 1 Cho = 10^12.
+- International: 1 Million = 10^6; 1 Billion = 10^9; 1 Trillion = 10^12.
+
+### 2. CRITICAL EXECUTION PROTOCOLS
+
+Protocol A: Entity Disambiguation
+1. Extract data ONLY for the company matching the requested Ticker.
+2. The source text may list competitors (e.g. TCS vs Infosys). IGNORE metrics belonging to other companies.
+3. Ticker suffix tells the market: .NS/.BO = India, .L = UK, .T = Japan. Adjust currency logic accordingly.
+
+Protocol B: The "Lakh-Crore" Math Trap
+- 1 Lakh Crore INR = 10^12 INR = 1 Trillion INR, NOT 1 Trillion USD.
+- Conversion: (Value in Lakh Crore * 10^12) / Exchange Rate.
+- Sanity Check: No Indian company exceeds ~$300B USD. No global company exceeds ~$4T USD. If your result exceeds these limits, YOUR MATH IS WRONG. Recalculate.
+
+Protocol C: Currency Normalization
+1. Detect currency from symbols (₹, $, €, £, ¥, KRW, GBX).
+2. Prioritize 2024-2025 (TTM) data. Ignore data older than 2023.
+3. Weak currencies (INR, JPY, KRW): DIVIDE by rate. Strong currencies (GBP, EUR): MULTIPLY by rate.
+4. UK: if priced in pence (GBX), divide by 100 to get GBP, then convert to USD.
+
+Protocol D: Global Market Consistency
+1. Market Cap, Revenue, Net Income and EPS are ALWAYS converted to USD.
+2. 52W High/Low remain in NATIVE currency.
+
+### 3. EXTRACTION STEPS (internal, before generating JSON)
+1. Identify the company name associated with the Ticker.
+2. Extract raw strings (e.g. "21.5 Lakh Cr", "450 Billion Yen", "€12.3 Billion").
+3. Normalize to plain numbers.
+4. Convert to USD at approximate rates: INR ~84, JPY ~150, GBP ~1.27, EUR ~1.10, KRW ~1,330.
+5. Format with B (Billion) / M (Million) and exactly 2 decimal places.
+
+### 4. REQUIRED OUTPUT (Strict JSON)
+Return ONLY this JSON object. If a metric is not found or ambiguous, set it to "N/A".
+{
+  "meta": {
+    "target_company": "Name of company identified",
+    "detected_currency": "Original currency (e.g. INR, JPY, USD)",
+    "exchange_rate_used": "Rate applied for conversion to USD (e.g. 84.5)",
+    "market_cap_usd": "Market cap converted to USD",
+    "math_scratchpad": "SHOW YOUR WORK. Ex: (21 Lakh Crore * 10^12) / 84 = $250B"
+  },
+  "metrics": {
+    "Market Cap": "Value in USD ONLY (e.g. 249.03B)",
+    "Revenue TTM": "Value in USD (e.g. 12.5B)",
+    "Net Income": "Value in USD",
+    "Beta": "Float value",
+    "PE Ratio": "Float value",
+    "EPS TTM": "Value in USD",
+    "Dividend Yield": "Percentage %",
+    "52W High": "Value in NATIVE currency",
+    "52W Low": "Value in NATIVE currency",
+    "Volume": "Value in M (Millions)",
+    "Shares Outstanding": "Value in B or M"
+  }
+}"""
+
+NEWS_SYSTEM = """You maintain a running news analysis for one stock.
+You receive the PREVIOUS SUMMARY (if any) and NEW HEADLINES published since then.
+
+Task:
+Merge the new headlines into the previous summary, keeping ONLY market-moving events:
+- Earnings & guidance
+- Analyst upgrades/downgrades
+- M&A
+- Regulatory, lawsuits, investigations
+- Leadership changes
+Drop items from the previous summary that the new headlines supersede.
+
+Return STRICT JSON ONLY. No markdown, no extra text:
+{"News": {"news_summary": "Your summary here...", "impact_level": "HIGH | MEDIUM | LOW"}}"""
+
+DETAILS_SYSTEM = """Extract the following company details from the search results in the request:
+1. CEO Name
+2. Year Founded
+3. Industry
+4. Sector
+Return STRICT JSON ONLY. No markdown, no extra text.
+{"company_details": {"CEO": "Name of CEO", "founded": "Year Founded", "industry": "Industry Name", "sector": "Sector Name"}}"""
+
+ANALYST_SYSTEM = """You are a Senior Financial Analyst. Analyze the company in the request using ONLY the DATA provided.
+
+### INSTRUCTIONS:
+1. Analyze the data to determine a Buy/Sell/Hold recommendation.
+2. STRICT TEXT RULE: Use ONLY plain text. NO Markdown, NO asterisks (**), NO bolding, NO bullet point characters.
+3. JSON OUTPUT ONLY:
+{
+    "sentiment_score": 50,
+    "confidence_score": 50,
+    "recommendation": "BUY | SELL | HOLD",
+    "volatility": "Low | Medium | High",
+    "swot": {
+        "strengths": ["Factor 1", "Factor 2"],
+        "weaknesses": ["Factor 1", "Factor 2"],
+        "opportunities": ["Factor 1", "Factor 2"],
+        "threats": ["Factor 1", "Factor 2"]
+    },
+    "companies_details": {
+        "CEO": "Name",
+        "founded": "Year",
+        "industry": "Industry Name",
+        "sector": "Sector Name"
+    },
+    "summary": "Write a clean, professional paragraph here without any special formatting."
+}"""
+
+PEER_SYSTEM = """You are a Senior Equity Analyst comparing one company against its sector peers.
+You receive a PEER MATRIX with valuation (P/E, P/E percentile, price to book), momentum (3m/6m/1y returns,
+relative strength vs the peer median) and risk (annualized volatility, beta) for the target and its peers.
+
+### INSTRUCTIONS:
+1. Judge the target RELATIVE to its peers, not in absolute terms.
+2. Use ONLY the numbers in the matrix. Do not invent metrics.
+3. STRICT TEXT RULE: plain text only, no Markdown.
+4. JSON OUTPUT ONLY:
+{
+    "relative_valuation": "CHEAP | FAIR | EXPENSIVE",
+    "relative_momentum": "LEADER | INLINE | LAGGARD",
+    "relative_risk": "LOW | MEDIUM | HIGH",
+    "best_peer_alternative": "Ticker of the most attractive peer, or N/A",
+    "highlights": ["Observation 1", "Observation 2", "Observation 3"],
+    "summary": "One professional paragraph comparing the target with its peers."
+}"""
+
+STATIC_PREFIXES = {
+    "ticker_resolver": TICKER_SYSTEM,
+    "financials_agent": FUNDAMENTALS_SYSTEM,
+    "news_agent": NEWS_SYSTEM,
+    "company_details_agent": DETAILS_SYSTEM,
+    "master_analyst": ANALYST_SYSTEM,
+    "peer_analyst": PEER_SYSTEM,
+}
+
+# --- TOKEN ACCOUNTING ---
+
+_token_lock = threading.Lock()
+TOKEN_STATS = {}
+
+
+def estimate_tokens(text: str):
+    """Cheap offline estimate (~4 characters per token for Gemini tokenizers on English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def record_tokens(node: str, static_tokens: int, dynamic_tokens: int):
+    with _token_lock:
+        stats = TOKEN_STATS.setdefault(node, {"calls": 0, "static_tokens": 0, "dynamic_tokens": 0})
+        stats["calls"] += 1
+        stats["static_tokens"] += static_tokens
+        stats["dynamic_tokens"] += dynamic_tokens
+
+
+def token_report():
+    """Per-node static vs dynamic input tokens observed in this process."""
+    rows = []
+    with _token_lock:
+        for node, stats in TOKEN_STATS.items():
+            total = stats["static_tokens"] + stats["dynamic_tokens"]
+            rows.append({
+                "node": node,
+                "calls": stats["calls"],
+                "avg_static_tokens": stats["static_tokens"] // stats["calls"],
+                "avg_dynamic_tokens": stats["dynamic_tokens"] // stats["calls"],
+                "static_share": round(stats["static_tokens"] / total, 3) if total else 0.0,
+            })
+    return rows
+
+
+def print_token_report(rows: list):
+    print(f"{'node':24s} {'calls':>6} {'static':>8} {'dynamic':>8} {'static%':>8}")
+    for row in rows:
+        print(f"{row['node']:24s} {row['calls']:>6} {row['avg_static_tokens']:>8} "
+              f"{row['avg_dynamic_tokens']:>8} {row['static_share'] * 100:>7.1f}%")
+
+
+def record_log_tokens(path: str):
+    """Feeds a recorded prompt log through the token counters (system messages = static prefix)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            prompt = entry["prompt"]
+            if isinstance(prompt, str):
+                static, dynamic = "", prompt
+            else:
+                static = "".join(m["content"] for m in prompt if m["role"] == "system")
+                dynamic = "".join(m["content"] for m in prompt if m["role"] != "system")
+            record_tokens(entry["node"], estimate_tokens(static), estimate_tokens(dynamic))
+
+
+def build_messages(node: str, dynamic: str):
+    """Static system prefix first (cacheable), then the per-call dynamic suffix."""
+    static = STATIC_PREFIXES[node]
+    record_tokens(node, estimate_tokens(static), estimate_tokens(dynamic))
+    return [SystemMessage(content=static), HumanMessage(content=dynamic)]
+
+
+# --- SEARCH RESULT COMPACTION ---
+
+def compact_search_results(results: list, max_results: int = 8, max_snippet_chars: int = 300,
+                           max_total_chars: int = 2400):
+    """
+    Dedupes and truncates Google CSE results before they are embedded in a prompt.
+    Near-identical snippets (syndicated articles, mirror sites) are kept only once.
+    """
+    seen = set()
+    lines = []
+    total = 0
+    for result in results or []:
+        snippet = re.sub(r"\s+", " ", result.get("snippet", "")).strip()
+        title = re.sub(r"\s+", " ", result.get("title", "")).strip()
+        if not snippet:
+            continue
+        fingerprint = re.sub(r"[^a-z0-9]", "", snippet.lower())[:120]
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+
+        line = f"- {title}: {snippet[:max_snippet_chars]}"
+        if total + len(line) > max_total_chars:
+            break
+        lines.append(line)
+        total += len(line)
+        if len(lines) >= max_results:
+            break
+    return "\n".join(lines) if lines else "No search results found."
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt size report.")
+    parser.add_argument("--report", nargs="?", const="", metavar="LOG",
+                        help="Static vs dynamic tokens per node from a recorded prompt log "
+                             "(default: the model_router log)")
+    args = parser.parse_args()
+
+    if args.report is None:
+        for node_name, prefix in STATIC_PREFIXES.items():
+            print(f"{node_name:24s} static prefix ~{estimate_tokens(prefix)} tokens")
+    else:
+        from model_router import PROMPT_LOG
+        record_log_tokens(args.report or PROMPT_LOG)
+        print_token_report(token_report())
@@ -0,0 +1,197 @@
+"""
+Process-wide final-report cache shared by every Streamlit session.
+
+Reports are keyed by ticker and trading day. A fresh entry is served instantly;
+an entry older than REPORT_STALE_AFTER seconds is still served, but a single
+background refresh is started for it (stale-while-revalidate). Sessions notice
+the new version through a polling fragment in app.py.
+
+Backends: "memory" (default), "sqlite" (survives restarts, shared by processes
+on one host) or "redis" (REDIS_URL, shared across hosts; needs the redis package).
+"""
+import json
+import time
+import datetime
+import threading
+import streamlit as st
+from config import get_setting
+from storage import open_db
+
+REPORT_DB = "reports.db"
+STALE_AFTER_SECONDS = int(get_setting("REPORT_STALE_AFTER", 15 * 60))
+CACHE_BACKEND = get_setting("REPORT_CACHE_BACKEND", "memory")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    cache_key  TEXT PRIMARY KEY,
+    ticker     TEXT NOT NULL,
+    state_json TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    version    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    name   TEXT PRIMARY KEY,
+    ticker TEXT NOT NULL
+);
+"""
+
+
+def trading_day(now=None):
+    """Latest weekday (UTC) - weekend requests share Friday's report."""
+    day = (now or datetime.datetime.now(datetime.timezone.utc)).date()
+    while day.weekday() >= 5:
+        day -= datetime.timedelta(days=1)
+    return day.isoformat()
+
+
+def cache_key(ticker: str):
+    return f"{ticker.upper()}:{trading_day()}"
+
+
+def normalize_name(company_name: str):
+    return " ".join(company_name.lower().split())
+
+
+class ReportCache:
+    def __init__(self, backend: str = "memory"):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._aliases = {}
+        self._refreshing = set()
+        self._redis = None
+        if backend == "redis":
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(get_setting("REDIS_URL", "redis://localhost:6379/0"))
+            except ImportError:
+                print("   [Warning] redis package not installed, report cache falls back to memory")
+                self.backend = "memory"
+        elif backend == "sqlite":
+            with open_db(REPORT_DB) as conn:
+                conn.executescript(SCHEMA)
+
+    # --- shared backend I/O ---
+    def _load(self, key: str):
+        if self.backend == "sqlite":
+            with open_db(REPORT_DB) as conn:
+                row = conn.execute("SELECT * FROM reports WHERE cache_key = ?", (key,)).fetchone()
+            if row:
+                return {"state": json.loads(row["state_json"]), "ticker": row["ticker"],
+                        "created_at": row["created_at"], "version": row["version"]}
+        elif self.backend == "redis":
+            raw = self._redis.get(f"swarmtrader:report:{key}")
+            if raw:
+                return json.loads(raw)
+        return None
+
+    def _save(self, key: str, entry: dict):
+        if self.backend == "sqlite":
+            with open_db(REPORT_DB) as conn:
+                conn.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)",
+                             (key, entry["ticker"], json.dumps(entry["state"], default=str),
+                              entry["created_at"], entry["version"]))
+        elif self.backend == "redis":
+            self._redis.set(f"swarmtrader:report:{key}", json.dumps(entry, default=str), ex=3 * 24 * 3600)
+
+    def _load_alias(self, name: str):
+        if self.backend == "sqlite":
+            with open_db(REPORT_DB) as conn:
+                row = conn.execute("SELECT ticker FROM aliases WHERE name = ?", (name,)).fetchone()
+            return row["ticker"] if row else None
+        if self.backend == "redis":
+            raw = self._redis.hget("swarmtrader:aliases", name)
+            return raw.decode() if raw else None
+        return None
+
+    def _save_alias(self, name: str, ticker: str):
+        if self.backend == "sqlite":
+            with open_db(REPORT_DB) as conn:
+                conn.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?)", (name, ticker))
+        elif self.backend == "redis":
+            self._redis.hset("swarmtrader:aliases", name, ticker)
+
+    # --- public API ---
+    def resolve(self, company_name: str):
+        """Ticker previously resolved for this company name (no LLM call), or None."""
+        name = normalize_name(company_name)
+        with self._lock:
+            ticker = self._aliases.get(name)
+        if ticker is None:
+            ticker = self._load_alias(name)
+            if ticker:
+                with self._lock:
+                    self._aliases[name] = ticker
+        return ticker
+
+    def get(self, ticker: str):
+        key = cache_key(ticker)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or (self.backend != "memory" and self.is_stale(entry)):
+            # Another process may have refreshed it already
+            stored = self._load(key)
+            if stored and (entry is None or stored["version"] > entry["version"]):
+                entry = stored
+                with self._lock:
+                    self._entries[key] = entry
+        return entry
+
+    def lookup(self, company_name: str):
+        ticker = self.resolve(company_name)
+        return self.get(ticker) if ticker else None
+
+    def put(self, company_name: str, state: dict):
+        ticker = state.get("ticker", "")
+        report = state.get("final_report")
+        # Same rule as backtest.record_report: the analyst's fallback report is never shared
+        if not ticker or "UNKNOWN" in ticker or not report or report.get("analysis_failed"):
+            return None
+        key = cache_key(ticker)
+        name = normalize_name(company_name)
+        today = key.rsplit(":", 1)[1]
+        with self._lock:
+            # Keys carry the trading day; earlier days can never be served again
+            for old_key in [k for k in self._entries if not k.endswith(f":{today}")]:
+                del self._entries[old_key]
+            previous = self._entries.get(key)
+            entry = {"state": state, "ticker": ticker, "created_at": time.time(),
+                     "version": (previous["version"] + 1) if previous else 1}
+            self._entries[key] = entry
+            self._aliases[name] = ticker
+        self._save(key, entry)
+        self._save_alias(name, ticker)
+        return entry
+
+    def is_stale(self, entry: dict):
+        return time.time() - entry["created_at"] > STALE_AFTER_SECONDS
+
+    def is_refreshing(self, ticker: str):
+        with self._lock:
+            return ticker in self._refreshing
+
+    def refresh_async(self, company_name: str, ticker: str, runner):
+        """Starts one background re-run per ticker; runner(company_name) must return the final state."""
+        with self._lock:
+            if ticker in self._refreshing:
+                return False
+            self._refreshing.add(ticker)
+
+        def _refresh():
+            try:
+                print(f"--- [Report Cache] Background refresh for {ticker} ---")
+                if self.put(company_name, runner(company_name)) is None:
+                    print(f"   [Report Cache] Refresh for {ticker} produced no usable report, keeping the old one")
+            except Exception as e:
+                print(f"   [Report Cache] Refresh failed for {ticker}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(ticker)
+
+        threading.Thread(target=_refresh, name=f"refresh-{ticker}", daemon=True).start()
+        return True
+
+
+@st.cache_resource
+def get_report_cache():
+    return ReportCache(CACHE_BACKEND)
@@ -0,0 +1,139 @@
+"""
+Multi-year financial statement store.
+
+Annual and quarterly income statement, balance sheet and cash flow line items
+come from yahooquery's fundamentals endpoint (one request per frequency) and
+are kept as parquet files under DATA_DIR/statements, one per ticker and
+frequency, with one row per fiscal period. A file is only refetched when a new
+period should have been reported (period end + filing lag) and it has not
+been checked in the last day, so repeat runs read straight from disk.
+
+Growth and margin series are derived column-wise on the whole frame.
+"""
+import os
+import time
+import numpy as np
+import pandas as pd
+from config import DATA_DIR
+import market_data
+
+STATEMENTS_DIR = os.path.join(DATA_DIR, "statements")
+
+LINE_ITEMS = {
+    "income": ["TotalRevenue", "GrossProfit", "OperatingIncome", "NetIncome", "DilutedEPS", "EBITDA"],
+    "balance": ["TotalAssets", "TotalDebt", "StockholdersEquity", "CashAndCashEquivalents"],
+    "cash_flow": ["OperatingCashFlow", "CapitalExpenditure", "FreeCashFlow"],
+}
+ALL_ITEMS = [item for items in LINE_ITEMS.values() for item in items]
+
+# Days from fiscal period end until the next period's figures are normally filed
+PERIOD_DAYS = {"a": 365, "q": 91}
+FILING_LAG_DAYS = {"a": 90, "q": 45}
+RECHECK_SECONDS = 24 * 3600
+YOY_PERIODS = {"a": 1, "q": 4}
+
+
+def _path(ticker: str, frequency: str):
+    safe = "".join(c if c.isalnum() or c in ".-" else "_" for c in ticker.upper())
+    return os.path.join(STATEMENTS_DIR, f"{safe}_{frequency}.parquet")
+
+
+def fetch_statements(ticker: str, frequency: str = "a"):
+    """One fundamentals request for every tracked line item; one row per fiscal period."""
+    with market_data.client(ticker) as yahoo:
+        df = yahoo.get_financial_data(ALL_ITEMS, frequency=frequency, trailing=False)
+    if not isinstance(df, pd.DataFrame) or df.empty:
+        raise ValueError(df if isinstance(df, str) else f"No {frequency} statements for {ticker}")
+
+    df = df.reset_index(drop=True)
+    df["asOfDate"] = pd.to_datetime(df["asOfDate"])
+    for item in ALL_ITEMS:
+        if item not in df.columns:
+            df[item] = np.nan
+    columns = ["asOfDate", "periodType"] + (["currencyCode"] if "currencyCode" in df.columns else []) + ALL_ITEMS
+    return df[columns].sort_values("asOfDate").drop_duplicates("asOfDate", keep="last").reset_index(drop=True)
+
+
+def refresh_due(df, path: str, frequency: str, now: float = None):
+    """True when a newer fiscal period should exist and the file was not checked recently."""
+    now = now or time.time()
+    if df is None or df.empty:
+        return True
+    if now - os.path.getmtime(path) < RECHECK_SECONDS:
+        return False
+    next_filing = df["asOfDate"].max() + pd.Timedelta(days=PERIOD_DAYS[frequency] + FILING_LAG_DAYS[frequency])
+    return pd.Timestamp(now, unit="s") >= next_filing
+
+
+def load_statements(ticker: str, frequency: str = "a"):
+    """Cached statements for ticker, refetched only when a new period is expected."""
+    path = _path(ticker, frequency)
+    df = pd.read_parquet(path) if os.path.exists(path) else None
+    if not refresh_due(df, path, frequency):
+        return df
+
+    try:
+        fresh = fetch_statements(ticker, frequency)
+    except Exception as e:
+        print(f"   [Statements] {ticker} ({frequency}) fetch failed: {e}")
+        return df
+    os.makedirs(STATEMENTS_DIR, exist_ok=True)
+    if df is not None and fresh["asOfDate"].max() <= df["asOfDate"].max():
+        # Not filed yet - remember that we looked so the next check waits a day
+        os.utime(path)
+        return df
+    print(f"   ... [Statements] {ticker} ({frequency}) updated to {fresh['asOfDate'].max():%Y-%m-%d} ...")
+    if df is not None:
+        # Yahoo only returns the last few periods; keep older ones from the file (fresh rows win)
+        fresh = (pd.concat([df, fresh], ignore_index=True)
+                 .sort_values("asOfDate", kind="stable").drop_duplicates("asOfDate", keep="last")
+                 .reset_index(drop=True))
+    fresh.to_parquet(path, index=False)
+    return fresh
+
+
+def derived_series(df, frequency: str = "a"):
+    """Growth and margin columns computed on the whole frame at once."""
+    out = df[["asOfDate"]].copy()
+    revenue = df["TotalRevenue"].astype(float)
+    safe_revenue = revenue.where(revenue != 0)
+    equity = df["StockholdersEquity"].astype(float)
+    lag = YOY_PERIODS[frequency]
+
+    out["revenue"] = revenue
+    out["net_income"] = df["NetIncome"].astype(float)
+    out["revenue_growth"] = revenue.pct_change(lag, fill_method=None) * 100
+    out["net_income_growth"] = out["net_income"].pct_change(lag, fill_method=None) * 100
+    out["gross_margin"] = df["GrossProfit"] / safe_revenue * 100
+    out["operating_margin"] = df["OperatingIncome"] / safe_revenue * 100
+    out["net_margin"] = out["net_income"] / safe_revenue * 100
+    out["fcf_margin"] = df["FreeCashFlow"] / safe_revenue * 100
+    out["debt_to_equity"] = df["TotalDebt"] / equity.where(equity != 0)
+    return out.replace([np.inf, -np.inf], np.nan)
+
+
+def _records(series):
+    """JSON-safe lists (NaN -> None) so the result can live in node_cache / session state."""
+    return [None if pd.isna(v) else round(float(v), 4) for v in series]
+
+
+def chart_data(ticker: str):
+    """Annual and quarterly revenue / net income / margin series for the UI; {} when unavailable."""
+    result = {}
+    for frequency, label_format in (("a", "%Y"), ("q", "%Y-%m")):
+        df = load_statements(ticker, frequency)
+        if df is None or df.empty:
+            continue
+        series = derived_series(df, frequency)
+        block = {"periods": series["asOfDate"].dt.strftime(label_format).tolist()}
+        for column in series.columns.drop("asOfDate"):
+            block[column] = _records(series[column])
+        if "currencyCode" in df.columns:
+            block["currency"] = df["currencyCode"].dropna().iloc[-1] if df["currencyCode"].notna().any() else ""
+        result["annual" if frequency == "a" else "quarterly"] = block
+
+    if "annual" in result:
+        # Flat keys kept for existing consumers of chart_data
+        result.update(years=result["annual"]["periods"], revenue=result["annual"]["revenue"],
+                      net_income=result["annual"]["net_income"])
+    return result
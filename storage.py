@@ -0,0 +1,29 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from config import DATA_DIR
+
+
+def db_path(db_name: str):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, db_name)
+
+
+@contextmanager
+def open_db(db_name: str):
+    """
+    Opens a short-lived SQLite connection inside DATA_DIR.
+    Commits on success, rolls back on error and always closes, so it is safe
+    to use from Streamlit script threads, background threads and worker processes.
+    """
+    conn = sqlite3.connect(db_path(db_name), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,287 @@
+"""
+Schema-validated structured output for every graph node.
+
+Each node call is bound to a JSON schema (Gemini native structured output), parsed
+with a tolerant single-pass parser, and - only when that still fails - repaired
+by a targeted retry of that one node instead of a full pipeline re-run.
+"""
+import json
+import threading
+from collections import Counter
+from langchain_core.messages import SystemMessage, HumanMessage
+import model_router
+
+# --- JSON SCHEMAS (one per node) ---
+
+def _string_object(keys):
+    return {"type": "object", "properties": {k: {"type": "string"} for k in keys}, "required": list(keys)}
+
+
+FUNDAMENTAL_METRICS = ["Market Cap", "Revenue TTM", "Net Income", "Beta", "PE Ratio", "EPS TTM",
+                       "Dividend Yield", "52W High", "52W Low", "Volume", "Shares Outstanding"]
+DETAIL_KEYS = ["CEO", "founded", "industry", "sector"]
+SWOT_KEYS = ["strengths", "weaknesses", "opportunities", "threats"]
+
+SCHEMAS = {
+    "ticker_resolver": {
+        "type": "object",
+        "properties": {"ticker": {"type": "string", "nullable": True}},
+        "required": ["ticker"],
+    },
+    "financials_agent": {
+        "type": "object",
+        "properties": {
+            "meta": _string_object(["target_company", "detected_currency", "exchange_rate_used",
+                                    "market_cap_usd", "math_scratchpad"]),
+            "metrics": _string_object(FUNDAMENTAL_METRICS),
+        },
+        "required": ["meta", "metrics"],
+    },
+    "news_agent": {
+        "type": "object",
+        "properties": {
+            "News": {
+                "type": "object",
+                "properties": {
+                    "news_summary": {"type": "string"},
+                    "impact_level": {"type": "string", "enum": ["HIGH", "MEDIUM", "LOW"]},
+                },
+                "required": ["news_summary", "impact_level"],
+            }
+        },
+        "required": ["News"],
+    },
+    "company_details_agent": {
+        "type": "object",
+        "properties": {"company_details": _string_object(DETAIL_KEYS)},
+        "required": ["company_details"],
+    },
+    "master_analyst": {
+        "type": "object",
+        "properties": {
+            "sentiment_score": {"type": "integer"},
+            "confidence_score": {"type": "integer"},
+            "recommendation": {"type": "string", "enum": ["BUY", "SELL", "HOLD"]},
+            "volatility": {"type": "string", "enum": ["Low", "Medium", "High"]},
+            "swot": {
+                "type": "object",
+                "properties": {k: {"type": "array", "items": {"type": "string"}} for k in SWOT_KEYS},
+                "required": SWOT_KEYS,
+            },
+            "companies_details": _string_object(DETAIL_KEYS),
+            "summary": {"type": "string"},
+        },
+        "required": ["sentiment_score", "confidence_score", "recommendation", "volatility",
+                     "swot", "companies_details", "summary"],
+    },
+    "peer_analyst": {
+        "type": "object",
+        "properties": {
+            "relative_valuation": {"type": "string", "enum": ["CHEAP", "FAIR", "EXPENSIVE"]},
+            "relative_momentum": {"type": "string", "enum": ["LEADER", "INLINE", "LAGGARD"]},
+            "relative_risk": {"type": "string", "enum": ["LOW", "MEDIUM", "HIGH"]},
+            "best_peer_alternative": {"type": "string"},
+            "highlights": {"type": "array", "items": {"type": "string"}},
+            "summary": {"type": "string"},
+        },
+        "required": ["relative_valuation", "relative_momentum", "relative_risk",
+                     "best_peer_alternative", "highlights", "summary"],
+    },
+}
+
+# --- PARSE FAILURE ACCOUNTING ---
+
+_stats_lock = threading.Lock()
+PARSE_STATS = Counter()
+
+
+def _count(node: str, event: str):
+    with _stats_lock:
+        PARSE_STATS[(node, event)] += 1
+
+
+def parse_stats():
+    """
+    {node: {event: count}}. Each model response records one of ok / tolerant_fix (parsed
+    directly) or repair_ok / repair_failed (needed the repair call); failed is recorded once
+    per invoke_json call that ran out of retries.
+    """
+    report = {}
+    with _stats_lock:
+        for (node, event), count in PARSE_STATS.items():
+            report.setdefault(node, {})[event] = count
+    return report
+
+
+# --- TOLERANT SINGLE-PASS PARSER ---
+
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_VALUE_END = set('"}]') | set("0123456789") | {"e", "l"}  # closing string/container, number, true/false/null
+
+
+def repair_json_text(text: str):
+    """
+    One scan over the model output that
+    - skips any prose / markdown fences before the first '{' or '['
+    - drops trailing commas, inserts missing commas between adjacent values
+    - escapes raw newlines inside strings, maps True/False/None to JSON literals
+    - stops at the end of the first top-level value and closes anything left open
+    Returns (json_text, changed) or (None, False) when there is no JSON at all.
+    """
+    start = min([i for i in (text.find("{"), text.find("[")) if i >= 0], default=-1)
+    if start < 0:
+        return None, False
+
+    out = []
+    stack = []
+    in_string = escape = changed = False
+    pending_comma = False
+    token = ""
+    last = ""  # last significant character written outside strings
+
+    def emit_value_start():
+        nonlocal pending_comma, changed
+        if pending_comma:
+            out.append(",")
+            pending_comma = False
+        elif last in _VALUE_END and stack:
+            out.append(",")
+            changed = True
+
+    def flush_token():
+        nonlocal token, last, changed
+        if token:
+            word = _LITERALS.get(token, token)
+            changed |= word != token
+            out.append(word)
+            last = word[-1]
+            token = ""
+
+    for ch in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                last = '"'
+            elif ch == "\n":
+                out.append("\\n")
+                changed = True
+                continue
+            out.append(ch)
+            continue
+
+        if ch.isalnum() or ch in "+-.":
+            if not token:
+                emit_value_start()
+            token += ch
+            continue
+        flush_token()
+
+        if ch.isspace():
+            out.append(ch)
+        elif ch == '"':
+            emit_value_start()
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            emit_value_start()
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+            last = ch
+        elif ch in "}]":
+            if pending_comma:
+                pending_comma = False
+                changed = True
+            if not stack:
+                break
+            out.append(stack.pop())
+            last = ch
+            if not stack:
+                break
+        elif ch == ",":
+            if pending_comma or last in "{[,:":
+                changed = True
+            else:
+                pending_comma = True
+        elif ch == ":":
+            out.append(ch)
+            last = ch
+    else:
+        flush_token()
+        if in_string:
+            out.append('"')
+        if stack:
+            out.extend(reversed(stack))
+            changed = True
+
+    return "".join(out), changed
+
+
+def parse_json(text: str, node: str = "unknown", count: bool = True):
+    """
+    Strict json.loads first; tolerant repair only if that fails. Raises ValueError if both fail.
+    count=False leaves the outcome to the caller (invoke_json's repair path counts its own).
+    """
+    text = text or ""
+    try:
+        data = json.loads(text.strip())
+        if count:
+            _count(node, "ok")
+        return data
+    except ValueError:
+        pass
+
+    repaired, changed = repair_json_text(text)
+    if repaired is None:
+        raise ValueError("No JSON found")
+    data = json.loads(repaired)
+    if count:
+        _count(node, "tolerant_fix" if changed else "ok")
+    return data
+
+
+# --- STRUCTURED INVOKE WITH TARGETED REPAIR ---
+
+REPAIR_SYSTEM = """You repair malformed JSON produced by another model.
+Return ONLY the corrected JSON object, preserving every value that was present.
+Do not add commentary or markdown."""
+
+
+def _structured_llm(node: str):
+    return model_router.get_llm(node).bind(
+        response_mime_type="application/json",
+        response_schema=SCHEMAS[node],
+    )
+
+
+def invoke_json(node: str, messages, retries: int = 1):
+    """
+    Invokes the node's routed model with native structured output and returns the parsed dict.
+    On a parse failure the broken output is sent back once for repair; if that also fails the
+    node call itself is retried (only this node - never the whole graph).
+    """
+    llm = _structured_llm(node)
+    last_error = None
+    for attempt in range(retries + 1):
+        model_router.record_prompt(node, messages, model_router.get_node_config(node)["model"])
+        response = llm.invoke(messages)
+        try:
+            return parse_json(response.content, node)
+        except ValueError as e:
+            last_error = e
+            print(f"   [{node}] JSON parse failed (attempt {attempt + 1}): {e}")
+
+        try:
+            repaired = llm.invoke([SystemMessage(content=REPAIR_SYSTEM), HumanMessage(content=response.content)])
+            data = parse_json(repaired.content, node, count=False)
+            _count(node, "repair_ok")
+            return data
+        except ValueError as e:
+            last_error = e
+            _count(node, "repair_failed")
+
+    _count(node, "failed")
+    raise ValueError(f"{node}: unparseable model output after repair/retry ({last_error})")
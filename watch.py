@@ -0,0 +1,281 @@
+"""
+Watch mode: continuous monitoring of a watchlist with event-triggered re-analysis.
+
+Quotes for the whole watchlist are polled in batched yahooquery calls. Each tick
+updates per-ticker rolling statistics in O(1) using fixed-size numpy ring
+buffers with running sums, so hundreds of names cost almost nothing between
+events. Only when a threshold fires (large move, return or volume shock, 52W
+high/low break) is a targeted News Agent + Master Analyst re-run started,
+reusing cached fundamentals, details and price history from node_cache.
+
+Settings (secrets.toml or environment):
+    SWARMTRADER_WATCHLIST    same watchlist as prewarm.py
+    WATCH_INTERVAL_SECONDS   poll interval, default 60
+    WATCH_WINDOW             ticks kept for rolling stats, default 30
+    WATCH_MOVE_PCT           move since last analysis that triggers, default 3
+    WATCH_RETURN_Z / WATCH_VOLUME_Z   shock thresholds in std devs, default 4 / 3
+    WATCH_COOLDOWN_SECONDS   minimum gap between re-runs per ticker, default 1800
+
+Usage:  python watch.py              # monitor and re-analyze on events
+        python watch.py --dry-run    # only print the events
+"""
+import os
+import json
+import math
+import time
+import argparse
+import numpy as np
+from yahooquery import Ticker
+from config import get_setting, DATA_DIR
+import node_cache
+import market_data
+
+EVENT_LOG = os.path.join(DATA_DIR, "watch_events.jsonl")
+BATCH_SIZE = 100
+MIN_SAMPLES = 10
+
+
+class RingBuffer:
+    """Fixed-size float window with running sum and sum of squares - O(1) push, mean and std."""
+
+    def __init__(self, size: int):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.size = size
+        self.count = 0
+        self.head = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, value: float):
+        if self.count == self.size:
+            old = self.values[self.head]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.head] = value
+        self.total += value
+        self.total_sq += value * value
+        self.head = (self.head + 1) % self.size
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        mean = self.mean()
+        # Running sums can drift slightly negative through float cancellation
+        return math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+    def zscore(self, value: float):
+        std = self.std()
+        return (value - self.mean()) / std if std > 0 and self.count >= MIN_SAMPLES else 0.0
+
+
+class TickerStats:
+    """Rolling state for one symbol; update() is constant time per tick."""
+
+    def __init__(self, window: int, high_52w: float = None, low_52w: float = None):
+        self.returns = RingBuffer(window)
+        self.volumes = RingBuffer(window)
+        self.last_price = None
+        self.last_volume = None
+        self.last_time = None
+        self.reference_price = None  # price at the last analysis
+        self.high_52w = high_52w
+        self.low_52w = low_52w
+
+    def update(self, price: float, volume: float, market_time):
+        """Returns the tick's indicators, or None when the quote has not changed."""
+        if price is None or market_time == self.last_time:
+            return None
+        self.last_time = market_time
+        if self.last_price is None:
+            self.last_price, self.last_volume, self.reference_price = price, volume, price
+            return None
+
+        ret = math.log(price / self.last_price) if self.last_price > 0 and price > 0 else 0.0
+        # regularMarketVolume is cumulative for the session; a drop means a new session began
+        volume_delta = volume - self.last_volume if volume is not None and self.last_volume is not None \
+            and volume >= self.last_volume else (volume or 0.0)
+
+        tick = {
+            "price": price,
+            "return_z": self.returns.zscore(ret),
+            "volume_z": self.volumes.zscore(volume_delta),
+            "volatility": self.returns.std(),
+            "move_pct": (price / self.reference_price - 1) * 100 if self.reference_price else 0.0,
+            "new_high": self.high_52w is not None and price > self.high_52w,
+            "new_low": self.low_52w is not None and price < self.low_52w,
+        }
+        self.returns.push(ret)
+        self.volumes.push(volume_delta)
+        if tick["new_high"]:
+            self.high_52w = price
+        if tick["new_low"]:
+            self.low_52w = price
+        self.last_price, self.last_volume = price, volume
+        return tick
+
+
+def check_thresholds(tick: dict, thresholds: dict):
+    reasons = []
+    if abs(tick["move_pct"]) >= thresholds["move_pct"]:
+        reasons.append(f"moved {tick['move_pct']:+.1f}% since last analysis")
+    if abs(tick["return_z"]) >= thresholds["return_z"]:
+        reasons.append(f"return shock z={tick['return_z']:+.1f}")
+    if tick["volume_z"] >= thresholds["volume_z"]:
+        reasons.append(f"volume spike z={tick['volume_z']:.1f}")
+    if tick["new_high"]:
+        reasons.append("new 52-week high")
+    if tick["new_low"]:
+        reasons.append("new 52-week low")
+    return reasons
+
+
+# --- BATCHED QUOTES ---
+
+def _batches(symbols: list):
+    return [symbols[i:i + BATCH_SIZE] for i in range(0, len(symbols), BATCH_SIZE)]
+
+
+def fetch_quotes(clients: list):
+    """{symbol: price module dict} for every symbol, one request batch per client."""
+    quotes = {}
+    for client in clients:
+        try:
+            data = client.price
+        except Exception as e:
+            print(f"   [Watch] Quote batch failed: {e}")
+            continue
+        quotes.update({symbol: q for symbol, q in data.items() if isinstance(q, dict)})
+    return quotes
+
+
+def fetch_52w_levels(symbols: list):
+    levels = {}
+    for batch in _batches(symbols):
+        try:
+            with market_data.client(batch, asynchronous=True) as yahoo:
+                data = yahoo.summary_detail
+        except Exception as e:
+            print(f"   [Watch] 52W levels failed: {e}")
+            continue
+        for symbol, detail in data.items():
+            if isinstance(detail, dict):
+                levels[symbol] = (detail.get("fiftyTwoWeekHigh"), detail.get("fiftyTwoWeekLow"))
+    return levels
+
+
+# --- TARGETED RE-ANALYSIS ---
+
+def reanalyze(company_name: str, ticker: str, event: dict = None):
+    """
+    News Agent + Master Analyst only; fundamentals and company details come from the
+    node caches. Price bars and news are refetched, and the triggering tick (event)
+    is handed to the analyst.
+    """
+    import agent_graph
+    import backtest
+
+    state = {
+        "company_name": company_name,
+        "ticker": ticker,
+        "messages": [],
+        "financial_data": node_cache.get("financials", ticker, include_stale=True) or {},
+        "company_details": node_cache.get("company_details", ticker, include_stale=True) or {},
+        "market_data": agent_graph.get_stock_price(ticker, force=True),
+        "market_event": event or {"reasons": ["manual re-run"]},
+    }
+    state.update(agent_graph.news_agent(state))
+    state.update(agent_graph.analyst_node(state))
+    report = state.get("final_report", {})
+    backtest.record_report(ticker, report)
+
+    from report_cache import ReportCache, CACHE_BACKEND
+    if CACHE_BACKEND != "memory":
+        ReportCache(CACHE_BACKEND).put(company_name, state)
+    return report
+
+
+def log_event(event: dict):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(EVENT_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(event, default=str) + "\n")
+
+
+def resolve_watchlist(names: list):
+    """{ticker: company name}; ticker resolution is served from node_cache after the first run."""
+    import agent_graph
+
+    resolved = {}
+    for name in names:
+        ticker = agent_graph.ticker_node({"company_name": name})["ticker"]
+        if ticker and "UNKNOWN" not in ticker:
+            resolved[ticker] = name
+        else:
+            print(f"   [Watch] Could not resolve '{name}', skipping")
+    return resolved
+
+
+def watch(names: list, interval: float = None, dry_run: bool = False, max_ticks: int = None):
+    interval = interval or float(get_setting("WATCH_INTERVAL_SECONDS", 60))
+    window = int(get_setting("WATCH_WINDOW", 30))
+    cooldown = float(get_setting("WATCH_COOLDOWN_SECONDS", 1800))
+    thresholds = {
+        "move_pct": float(get_setting("WATCH_MOVE_PCT", 3)),
+        "return_z": float(get_setting("WATCH_RETURN_Z", 4)),
+        "volume_z": float(get_setting("WATCH_VOLUME_Z", 3)),
+    }
+
+    watchlist = resolve_watchlist(names)
+    symbols = list(watchlist)
+    levels = fetch_52w_levels(symbols)
+    stats = {s: TickerStats(window, *levels.get(s, (None, None))) for s in symbols}
+    last_run = {}
+    # One dedicated client per batch for the whole session (kept out of the shared pool)
+    clients = [Ticker(batch, asynchronous=True) for batch in _batches(symbols)]
+    print(f"--- [Watch] Monitoring {len(symbols)} tickers every {interval:.0f}s ---")
+
+    ticks = 0
+    while max_ticks is None or ticks < max_ticks:
+        started = time.time()
+        quotes = fetch_quotes(clients)
+        for symbol, quote in quotes.items():
+            tick = stats[symbol].update(quote.get("regularMarketPrice"), quote.get("regularMarketVolume"),
+                                        quote.get("regularMarketTime"))
+            if tick is None:
+                continue
+            reasons = check_thresholds(tick, thresholds)
+            if not reasons:
+                continue
+            cooling = started - last_run.get(symbol, 0) < cooldown
+            event = {"ts": started, "ticker": symbol, "reasons": reasons, "price": tick["price"],
+                     "action": "cooldown" if cooling else ("logged" if dry_run else "reanalyzed")}
+            print(f"   [Watch] {symbol}: {', '.join(reasons)} -> {event['action']}")
+            if not cooling and not dry_run:
+                try:
+                    report = reanalyze(watchlist[symbol], symbol, {**tick, "reasons": reasons})
+                    event["recommendation"] = report.get("recommendation")
+                    event["confidence_score"] = report.get("confidence_score")
+                except Exception as e:
+                    print(f"   [Watch] Re-analysis of {symbol} failed: {e}")
+                    event["action"] = "failed"
+            if not cooling:
+                last_run[symbol] = started
+                stats[symbol].reference_price = tick["price"]
+            log_event(event)
+        ticks += 1
+        time.sleep(max(interval - (time.time() - started), 0))
+
+
+if __name__ == "__main__":
+    from prewarm import load_watchlist
+
+    parser = argparse.ArgumentParser(description="Monitor the watchlist and re-analyze on market events.")
+    parser.add_argument("--interval", type=float, default=None, help="Seconds between quote polls")
+    parser.add_argument("--dry-run", action="store_true", help="Log events without running the analysts")
+    args = parser.parse_args()
+
+    watch(load_watchlist(), interval=args.interval, dry_run=args.dry_run)